@@ -1,27 +1,119 @@
 #!/usr/bin/env python3
 import asyncio
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from collections import deque
 from collections import defaultdict
+import os
 import json
 import functools
 import uuid
 import time
 import datetime as dt
 
-import numpy as np
 import asyncio_atexit
 
 from async_app.logger import logger
-from async_app.patterns import periodical
-from async_app.tools import app_name, log_indent, process_monitor, system_monitor
+from async_app.patterns import overrun_policies
+from async_app.scheduler import PeriodicScheduler, concurrency_policies
+from async_app.graph import TaskGraph
+from async_app.loop_monitor import LoopMonitor, lag_buckets
+from async_app.stats import TaskStatistics
+from async_app.shards import partition, sharding_strategies
+from async_app.sinks import CallbackSink, ResultSummary, create_sink
+from async_app.tools import app_name, app_env_prefix, log_indent
+from async_app.tools import process_monitor, system_monitor
+import async_app.loops as app_loops
 import async_app.state as app_state  # for keep_running to make it singleton
 
 import async_app.messenger as app_messenger
+import async_app.metrics as app_metrics
+import async_app.timeseries as app_timeseries
+
+executors = ("loop", "thread", "process")
+
+# metrics per task, as name, kind, documentation and quantile, see collect_metrics
+periodical_metrics = (
+    ("async_app_periodical_ticks_total", "counter", "Ticks of periodicals.", None),
+    (
+        "async_app_periodical_dropped_total",
+        "counter",
+        "Ticks skipped by the overrun or concurrency policy.",
+        None,
+    ),
+    (
+        "async_app_periodical_coalesced_total",
+        "counter",
+        "Missed ticks coalesced into one call.",
+        None,
+    ),
+    (
+        "async_app_periodical_cancelled_total",
+        "counter",
+        "Calls cancelled by the 'cancel_oldest' concurrency policy.",
+        None,
+    ),
+    (
+        "async_app_periodical_running",
+        "gauge",
+        "Calls of periodicals running at the moment.",
+        None,
+    ),
+    (
+        "async_app_periodical_queued",
+        "gauge",
+        "Calls of periodicals waiting for a running one to finish.",
+        None,
+    ),
+)
+call_metrics = (
+    ("async_app_task_calls_total", "counter", "Calls of observed tasks.", None),
+    (
+        "async_app_task_failures_total",
+        "counter",
+        "Calls of observed tasks that raised.",
+        None,
+    ),
+) + tuple(
+    (
+        "async_app_task_duration_seconds",
+        "gauge",
+        "Quantiles of the call durations of observed tasks.",
+        quantile,
+    )
+    for quantile in ("0.5", "0.9", "0.99")
+)
+# labels of metrics per task
+task_labels = ("app", "task", "uid")
+
+
+def _run_shard(shard, task_descriptions, options, shard_queue, stop_event):
+    """Entry point of a shard process, running its share of the task descriptions."""
+    app = AsyncApp(**options, workers=1, shard=shard, shard_queue=shard_queue)
+    for task_description in task_descriptions:
+        app.add_task_description(dict(task_description))
+
+    async def main():
+        # not a task of the app, as it must not keep the shard running
+        watcher = asyncio.create_task(app.watch_stop_event(stop_event))
+        try:
+            return await app.run()
+        finally:
+            watcher.cancel()
+
+    # the results went to the parent one by one, see forward_result
+    app_loops.run(main(), app.event_loop, app.debug, app.slow_callback_duration)
+    shard_queue.put(("statistics", shard, {"periodicals": app.scheduler.statistics()}))
 
 
 class AsyncApp(object):
     def __init__(self, **kwargs):
         self.name = app_name
+        self.shard = kwargs.pop("shard", None)
+        self.shard_queue = kwargs.pop("shard_queue", None)
+        if self.shard is not None:
+            self.name = f"{app_name}:shard{self.shard}"
         logger.info(f"Initializing AsyncApp {self.name}")
 
         logger.debug(f"My kwargs: {kwargs}")
@@ -32,12 +124,101 @@ class AsyncApp(object):
             "periodic": [],
             "cleanup": [],
         }
-        self.tasks = []
-        self.results = []
-
+        # task states, kept up to date by done callbacks, see track_task
+        self.running_tasks = set()
+        self.task_counts = {"running": 0, "done": 0, "failed": 0, "cancelled": 0}
+        self.task_changes_maxlen = 1000
+        self.task_changes = deque(maxlen=self.task_changes_maxlen)
+        self.task_changes_dropped = 0
+        self.task_version = 0
+        self.task_monitor_version = 0
+        self.init_tasks = []
+
+        # finished tasks are handed to the result sink and released, see track_task.
+        # Shards hand them on to the parent, which feeds its own sink.
+        if self.shard_queue is not None:
+            self.result_sink = CallbackSink(self.forward_result)
+        else:
+            self.result_sink = create_sink(
+                kwargs.get("result_sink", None) or "ring",
+                kwargs.get("result_buffer_size", None) or 1000,
+                kwargs.get("result_file", None),
+            )
+        self.result_summary = ResultSummary()
+
+        self.graph = TaskGraph()
+
+        # time in seconds for tasks to finish on exit, before they are cancelled
+        self.drain_timeout = kwargs.get("drain_timeout", 5.0)
+        self._loop = None
+        self._drain_task = None
+
+        self.scheduler = PeriodicScheduler(drain_timeout=self.drain_timeout)
+        self.scheduler_task = None
         self.periodicals = {}
-        self.periodicals_timing = {}
-        self.periodicals_timing_maxlen = 21
+
+        # call statistics of all tasks or of those with 'monitor' set, see observe
+        self.collect_statistics = kwargs.get("task_statistics", False)
+        self.task_statistics = {}
+        self.task_names = {}
+
+        # samples of the metrics of the app by task uid, see collect_metrics
+        self._app_samples = None
+        self._periodical_samples = {}
+        self._call_samples = {}
+
+        # '0' or None let concurrent.futures decide about the pool sizes
+        self.pool_sizes = {
+            "thread": kwargs.get("thread_pool_size", None) or None,
+            "process": kwargs.get("process_pool_size", None) or None,
+        }
+        self.executors = {}
+
+        # run the tasks in 'workers' processes, see run_sharded
+        self.workers = kwargs.get("workers", 1) or 1
+        self.sharding = kwargs.get("sharding", "weight")
+        if self.sharding not in sharding_strategies:
+            logger.error(f"Unknown sharding '{self.sharding}'. Using 'weight'.")
+            self.sharding = "weight"
+        self.shard_records = {}
+        self.shard_statistics = {}
+        self.stop_event = None
+        # event loop settings, see serve. Defaults may be set in the environment,
+        # e.g. by config.read_config
+        self.event_loop = kwargs.get("event_loop", None) or os.environ.get(
+            f"{app_env_prefix}_EVENT_LOOP", "auto"
+        )
+        if self.event_loop not in app_loops.event_loops:
+            logger.error(f"Unknown event loop '{self.event_loop}'. Using 'auto'.")
+            self.event_loop = "auto"
+        self.debug = kwargs.get("debug", None)
+        if self.debug is None:
+            self.debug = os.environ.get(f"{app_env_prefix}_DEBUG", "").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self.slow_callback_duration = kwargs.get("slow_callback_duration", None)
+        if self.slow_callback_duration is None:
+            self.slow_callback_duration = float(
+                os.environ.get(f"{app_env_prefix}_SLOW_CALLBACK_DURATION", 0.1)
+            )
+
+        # loop lag and stalls, see loop_monitor
+        self.loop_monitoring = LoopMonitor(self.slow_callback_duration)
+
+        # the messenger backend is process wide, e.g. 'local' when no redis is around
+        messenger_backend = kwargs.get("messenger_backend", None)
+        if messenger_backend is not None:
+            try:
+                app_messenger.set_backend(messenger_backend)
+            except ValueError as e:
+                logger.error(f"{e} Using '{app_messenger.backend_name}'.")
+
+        # shards are set up with the same options
+        self.options = {
+            key: value for key, value in kwargs.items() if key not in ("workers",)
+        }
 
         self.process_default_options(**kwargs)
 
@@ -48,6 +229,7 @@ class AsyncApp(object):
             "system_monitoring_frequency": system_monitor,
             "task_monitoring_frequency": self.task_monitor,
             "periodicals_monitoring_frequency": self.periodicals_monitor,
+            "loop_monitoring_frequency": self.loop_monitor,
         }
 
         for key, monitoring_function in monitor_mapping.items():
@@ -57,37 +239,127 @@ class AsyncApp(object):
 
             monitoring_frequency = kwargs[key]
             if monitoring_frequency > 0:
+                if self.shard_queue is not None:
+                    monitoring_function = self.forward_records(monitoring_function)
                 task_description = {
                     "kind": "periodic",
                     "function": monitoring_function,
                     "frequency": monitoring_frequency,
+                    "builtin": True,
                 }
                 self.add_task_description(task_description)
 
-    def add_monitoring_ts(self, uid):
-        self.periodicals_timing[uid].append(time.perf_counter())
+        # answer queries for the history of monitor records. Runs until the app exits.
+        if kwargs.get("timeseries_queries", False):
+            self.add_task_description(
+                {
+                    "kind": "continuous",
+                    "function": app_timeseries.serve_queries,
+                    "args": (f"{self.name}:timeseries",),
+                    "executor": "loop",
+                    "builtin": True,
+                }
+            )
+
+        # serve metrics to Prometheus, from the start. Runs until the app exits.
+        metrics_port = kwargs.get("metrics_port", None)
+        metrics_host = kwargs.get("metrics_host", None) or "0.0.0.0"
+        if metrics_port:
+            if self.shard is not None:
+                # a shard runs the tasks, the parent doesn't. One endpoint per shard.
+                metrics_port += self.shard
+            self.add_task_description(
+                {
+                    "kind": "continuous",
+                    "function": self.serve_metrics,
+                    "args": (metrics_port, metrics_host),
+                    "executor": "loop",
+                    "depends_on": [],
+                    "builtin": True,
+                }
+            )
+
+    def forward_records(self, monitoring_function):
+        """Wrap a monitor of a shard to send its records to the parent process."""
+
+        @functools.wraps(monitoring_function)
+        async def wrapper(*args, **kwargs):
+            if asyncio.iscoroutinefunction(monitoring_function):
+                record = await monitoring_function(*args, **kwargs)
+            else:
+                record = monitoring_function(*args, **kwargs)
+            # e.g. the task monitor returns None when nothing changed
+            if record is not None:
+                name = monitoring_function.__name__
+                self.shard_queue.put(("record", self.shard, (name, record)))
+            return record
+
+        return wrapper
+
+    def forward_result(self, record):
+        """Send the outcome of a task of a shard to the parent process."""
+        # records need to be pickled, but results may be arbitrary objects
+        record = json.loads(json.dumps(record, default=repr))
+        self.shard_queue.put(("result", self.shard, record))
 
     def add_task_description(self, task_description):
         """Add a task to todo list including args and kwargs."""
         logger.info(f"Adding new task with {task_description=}")
         task_description["name"] = task_description["function"].__name__
         task_description["uid"] = str(uuid.uuid4())
+        self.task_names[task_description["uid"]] = task_description["name"]
 
         # normalize task descriptions. Make sure expected properties exist
+        executor = task_description.get("executor", None)
+        if executor is not None and executor not in executors:
+            logger.error(f"Unknown executor '{executor}' detected. Not adding task.")
+            return
+
+        depends_on = task_description.get("depends_on", None)
+        if isinstance(depends_on, str):
+            task_description["depends_on"] = [depends_on]
+
         # re-write task kinds
         kind = task_description["kind"]
         if kind.lower() in ("init", "initialize"):
             task_description["kind"] = "init"
+            task_description.setdefault("executor", "thread")
             self.task_descriptions["init"].append(task_description)
         elif kind.lower() in ("continuous", "continuously"):
             task_description["kind"] = "continuous"
+            task_description.setdefault("executor", "thread")
+            # a process never sees 'keep_running' of the app and would block the exit
+            if task_description["executor"] == "process":
+                logger.error(
+                    "The 'process' executor is not supported for continuous tasks. "
+                    "Not adding task."
+                )
+                return
             self.task_descriptions["continuous"].append(task_description)
         elif kind.lower() in ("periodic", "periodical", "periodically"):
             task_description["kind"] = "periodic"
+            task_description.setdefault("executor", "loop")
 
             if "call_every" in task_description.keys():
                 task_description["frequency"] = 1 / task_description["call_every"]
 
+            overrun = task_description.setdefault("overrun", "skip")
+            if overrun not in overrun_policies:
+                logger.error(
+                    f"Unknown overrun policy '{overrun}' detected. Not adding task."
+                )
+                return
+
+            concurrency_policy = task_description.setdefault(
+                "concurrency_policy", "drop"
+            )
+            if concurrency_policy not in concurrency_policies:
+                logger.error(
+                    f"Unknown concurrency policy '{concurrency_policy}' detected. "
+                    "Not adding task."
+                )
+                return
+
             self.task_descriptions["periodic"].append(task_description)
         elif kind.lower() in ("cleanup", "teardown"):
             task_description["kind"] = "cleanup"
@@ -100,7 +372,7 @@ class AsyncApp(object):
         """Initialize tasks of kind 'kind'."""
         # filter for relevant tasks
         task_descriptions = self.task_descriptions[kind]
-        print(task_descriptions)
+        logger.debug(f"Found {len(task_descriptions)} task descriptions of {kind=}")
 
         tasks = []
         for task_description in task_descriptions:
@@ -116,27 +388,20 @@ class AsyncApp(object):
             args = task_description.get("args", ())
             kwargs = task_description.get("kwargs", {})
 
-            # derived properties
-            f_is_async = asyncio.iscoroutinefunction(function)
+            executor = task_description.get("executor", "loop")
 
-            if kind == "init":
-                if f_is_async:
-                    task = asyncio.create_task(function(*args, **kwargs), name=name)
-                else:
-                    task = asyncio.create_task(
-                        asyncio.to_thread(function(*args, **kwargs)), name=name
-                    )
-                # self.model["init"]["tasks"].append(task)
-                tasks.append(task)
+            # derived properties
+            function = self.route(function, executor)
+            if kind != "cleanup" and (
+                self.collect_statistics or task_description.get("monitor", False)
+            ):
+                function = self.observe(uid, function)
 
-            elif kind == "continuous":
-                if f_is_async:
-                    task = asyncio.create_task(function(*args, **kwargs), name=name)
-                else:
-                    task = asyncio.create_task(
-                        asyncio.to_thread(function(*args, **kwargs)), name=name
-                    )
-                # self.model["main"]["tasks"].append(task)
+            if kind in ("init", "continuous"):
+                task = asyncio.create_task(
+                    self.run_node(task_description, function, args, kwargs),
+                    name=name,
+                )
                 tasks.append(task)
 
             elif kind == "periodic":
@@ -144,25 +409,22 @@ class AsyncApp(object):
                 frequency = task_description["frequency"]
 
                 # optional properties for 'periodical' tasks
-                monitor = task_description.get("monitor", False)
-
-                if monitor:
-                    # add callback to monitor performance
-                    self.periodicals_timing[uid] = deque(
-                        [float("nan")] * self.periodicals_timing_maxlen,
-                        maxlen=self.periodicals_timing_maxlen,
-                    )
-                    monitoring_callback = functools.partial(self.add_monitoring_ts, uid)
-                else:
-                    monitoring_callback = None
-                task = asyncio.create_task(
-                    periodical(frequency, monitoring_callback)(function)(
-                        *args, **kwargs
-                    ),
+                overrun = task_description.get("overrun", "skip")
+                max_concurrency = task_description.get("max_concurrency", None)
+                concurrency_policy = task_description.get("concurrency_policy", "drop")
+
+                # all periodic tasks are served by a single scheduler task
+                self.scheduler.add(
+                    uid,
+                    function,
+                    frequency,
+                    args=args,
+                    kwargs=kwargs,
                     name=name,
+                    overrun=overrun,
+                    max_concurrency=max_concurrency,
+                    concurrency_policy=concurrency_policy,
                 )
-                tasks.append(task)
-                # self.model["main"]["tasks"].append(task)
                 self.periodicals[uid] = name
             elif kind == "cleanup":
                 cleanup_function = functools.partial(function, *args, **kwargs)
@@ -174,112 +436,553 @@ class AsyncApp(object):
                     f"Unknown task kind detected: {kind=}. Task will not be executed!"
                 )
 
-        # extend self.tasks for the task monitor to work properly
-        self.tasks.extend(tasks)
+        if kind == "periodic" and self.scheduler.entries:
+            task = asyncio.create_task(self.scheduler.run(), name=self.scheduler.name)
+            self.scheduler_task = task
+            tasks.append(task)
+
+        if kind == "init":
+            self.init_tasks = tasks
+
+        for task in tasks:
+            self.track_task(task)
         return tasks
 
+    async def run_node(self, task_description, function, args, kwargs):
+        """Run an init or continuous task as soon as its dependencies are available."""
+        if (
+            task_description["kind"] == "continuous"
+            and "depends_on" not in task_description
+            and self.init_tasks
+        ):
+            # without explicit dependencies, wait for the whole init phase
+            await asyncio.wait(self.init_tasks)
+
+        try:
+            resources = await self.graph.wait_for(task_description)
+            self.graph.started(task_description)
+            kwargs = {**kwargs, **resources}
+            if asyncio.iscoroutinefunction(function):
+                result = await function(*args, **kwargs)
+            else:
+                result = function(*args, **kwargs)
+        except BaseException as e:
+            self.graph.finished(task_description, exception=e)
+            raise
+
+        self.graph.finished(task_description, result=result)
+        return result
+
+    def report_critical_path(self):
+        """Log the chain of init tasks that determined the length of the init phase."""
+        uids = [
+            task_description["uid"]
+            for task_description in self.task_descriptions["init"]
+        ]
+        path = self.graph.critical_path(uids)
+        if not path:
+            return path
+
+        chain = " -> ".join(f"{name} ({duration:.3f} s)" for name, duration in path)
+        total = sum(duration for _, duration in path)
+        logger.info(f"Init critical path: {chain}, total {total:.3f} s")
+        return path
+
+    def observe(self, uid, function):
+        """Wrap 'function' to record the start and duration of its calls."""
+        statistics = self.task_statistics[uid] = TaskStatistics()
+
+        if asyncio.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    result = await function(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    statistics.observe(start, time.perf_counter() - start, failed)
+
+        else:
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    result = function(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    statistics.observe(start, time.perf_counter() - start, failed)
+
+        return wrapper
+
+    def statistics_snapshot(self):
+        """Return call count, rate and duration percentiles of the observed tasks."""
+        return {
+            uid: {"name": self.task_names[uid], **statistics.snapshot()}
+            for uid, statistics in self.task_statistics.items()
+        }
+
+    def get_executor(self, executor):
+        """Return the app wide pool for 'thread' or 'process' executors."""
+        if executor not in self.executors:
+            pool_size = self.pool_sizes[executor]
+            if executor == "thread":
+                # sync continuous tasks hold a worker for their whole lifetime.
+                # Add workers for them, so they can't starve other thread tasks.
+                reserved = sum(
+                    1
+                    for task_description in self.task_descriptions["continuous"]
+                    if task_description["executor"] == "thread"
+                    and not asyncio.iscoroutinefunction(task_description["function"])
+                )
+                if pool_size is None:
+                    # the default of concurrent.futures.ThreadPoolExecutor
+                    pool_size = min(32, (os.cpu_count() or 1) + 4)
+                pool_size += reserved
+                logger.debug(
+                    f"Creating {executor} pool with {pool_size=}, "
+                    f"{reserved} workers reserved for continuous tasks"
+                )
+                pool = ThreadPoolExecutor(pool_size, thread_name_prefix=self.name)
+            else:
+                logger.debug(f"Creating {executor} pool with {pool_size=}")
+                pool = ProcessPoolExecutor(pool_size)
+            self.executors[executor] = pool
+        return self.executors[executor]
+
+    def route(self, function, executor="loop"):
+        """Wrap a sync function to run on executor 'executor'.
+
+        Async functions and functions for the 'loop' executor are returned unchanged.
+        Functions to run on the 'process' executor must be picklable.
+        """
+        if executor == "loop" or asyncio.iscoroutinefunction(function):
+            return function
+
+        pool = self.get_executor(executor)
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                pool, functools.partial(function, *args, **kwargs)
+            )
+
+        return wrapper
+
+    async def shutdown_executors(self):
+        for executor, pool in self.executors.items():
+            logger.debug(f"Shutting down {executor} pool")
+            await asyncio.to_thread(pool.shutdown)
+        self.executors = {}
+
     async def run_tasks(self, tasks):
-        """Run tasks of kind 'kind'."""
+        """Wait for 'tasks' to complete, fail or be cancelled."""
 
         logger.info(f"Processing tasks")
 
-        try:
-            for coro in asyncio.as_completed(tasks):
-                try:
-                    await coro
-                    status = "completed"
-                except Exception as e:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            now = dt.datetime.now()
+            for task in done:
+                if task.cancelled():
+                    status = "cancelled"
+                elif task.exception() is not None:
                     status = "failed"
-                finally:
-                    task_name = coro.__name__
-                    now = dt.datetime.now()
-                    logger.debug(f"Task {task_name} {status} at {now.isoformat()}")
+                else:
+                    status = "completed"
+                logger.debug(f"Task {task.get_name()} {status} at {now.isoformat()}")
+
+    async def run_sharded(self):
+        """Run the tasks in 'self.workers' processes with an event loop each.
+
+        Continuous and periodic tasks are partitioned over the shards. Init and cleanup
+        tasks run in every shard, unless their description sets 'shard' to 'one'.
+        Those only run in the first shard. Results, monitoring records and periodicals
+        statistics of the shards are gathered here. Results go to the result sink of
+        this process as they arrive.
+        With process start methods other than 'fork', task functions must be picklable.
+        """
+        context = multiprocessing.get_context()
+        shard_queue = context.Queue()
+        self.stop_event = context.Event()
+
+        # built-in tasks like monitors are set up by each shard on its own
+        shared = [
+            task_description
+            for kind in ("init", "cleanup")
+            for task_description in self.task_descriptions[kind]
+            if not task_description.get("builtin", False)
+        ]
+        partitioned = [
+            task_description
+            for kind in ("continuous", "periodic")
+            for task_description in self.task_descriptions[kind]
+            if not task_description.get("builtin", False)
+        ]
+        shards = partition(partitioned, self.workers, self.sharding)
+
+        processes = []
+        for shard, task_descriptions in enumerate(shards):
+            if shard > 0:
+                shared = [
+                    task_description
+                    for task_description in shared
+                    if task_description.get("shard", "all") != "one"
+                ]
+            process = context.Process(
+                target=_run_shard,
+                args=(
+                    shard,
+                    shared + task_descriptions,
+                    self.options,
+                    shard_queue,
+                    self.stop_event,
+                ),
+                name=f"{self.name}:shard{shard}",
+            )
+            process.start()
+            processes.append(process)
+        logger.info(f"Started {len(processes)} shards")
+
+        while (
+            any(process.is_alive() for process in processes) or not shard_queue.empty()
+        ):
+            if not app_state.keep_running:
+                self.stop_event.set()
+
+            try:
+                kind, shard, payload = shard_queue.get_nowait()
+            except queue.Empty:
+                await app_state.sleep(0.1)
+                continue
 
-        except asyncio.CancelledError:
-            logger.info(f"Task {task_name} was cancelled")
+            if kind == "record":
+                name, record = payload
+                self.shard_records.setdefault(shard, {})[name] = record
+            elif kind == "result":
+                record = {**payload, "shard": shard}
+                self.result_summary.add(record)
+                self.result_sink.add(record)
+            elif kind == "statistics":
+                self.shard_statistics[shard] = payload["periodicals"]
+
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                logger.error(f"{process.name} exited with code {process.exitcode}")
+
+        self.result_sink.close()
+        logger.info(f"Summary: {json.dumps(self.result_summary.as_dict())}")
+        results = self.result_sink.results()
+        results_json = json.dumps(results, indent=log_indent, default=repr)
+        logger.info(f"Results: {results_json}")
+        return results
+
+    async def watch_stop_event(self, stop_event):
+        """Exit as soon as the parent of a shard asks to."""
+        while await app_state.sleep(0.1):
+            if stop_event.is_set():
+                self.exit()
+                break
+
+    def serve(self):
+        """Run the app on the configured event loop and return its results.
+
+        This replaces 'asyncio.run(app.run())'. The event loop implementation, debug
+        mode and the slow callback threshold are taken from the 'event_loop', 'debug'
+        and 'slow_callback_duration' options.
+        """
+        return app_loops.run(
+            self.run(), self.event_loop, self.debug, self.slow_callback_duration
+        )
 
     async def run(self):
+        self._loop = asyncio.get_running_loop()
+        if self.workers > 1:
+            return await self.run_sharded()
+
         # make sure to initialize cleanup tasks first
         tasks = await self.create_tasks("cleanup")
 
-        # Next would be init tasks run first
-        tasks = await self.create_tasks("init")
-        await self.run_tasks(tasks)
-
-        # only after that run the main tasks
+        # init and continuous tasks start as soon as their dependencies are met.
+        # Continuous tasks without dependencies wait for all init tasks.
+        self.graph.build(
+            self.task_descriptions["init"] + self.task_descriptions["continuous"]
+        )
+        init_tasks = await self.create_tasks("init")
         continuous_tasks = await self.create_tasks("continuous")
+        await self.run_tasks(init_tasks)
+        self.report_critical_path()
+
+        # only after that run the periodic tasks
         periodic_tasks = await self.create_tasks("periodic")
         await self.run_tasks(continuous_tasks + periodic_tasks)
 
+        await self.shutdown_executors()
+        self.loop_monitoring.stop()
+
         logger.info("All work is done. Here's the outcome")
-        # logger.info(f"Results: {json.dumps(self.results, indent=log_indent)}")
-
-        results = []
-        for task in self.tasks:
-            result = {
-                "name": task.get_name(),
-                "result": None,
-                "exception": None,
-            }
-            try:
-                # In case of a manual exit, before anything has been completed, neither an exception nor a result has been set
-                # querying these will lead to an exception ...
-                if not task.exception():
-                    result["result"] = task.result()
-                else:
-                    result["exception"] = str(task.exception())
-            except asyncio.exceptions.InvalidStateError:
-                logger.warning(
-                    f"Task {task.get_name()} could not be queried for results or exceptions."
-                )
-            finally:
-                results.append(result)
-        logger.info(f"Results: {json.dumps(results, indent=log_indent)}")
+        self.result_sink.close()
+        logger.info(f"Summary: {json.dumps(self.result_summary.as_dict())}")
+
+        results = self.result_sink.results()
+        # results may be arbitrary objects, like resources provided by init tasks
+        results_json = json.dumps(results, indent=log_indent, default=repr)
+        logger.info(f"Results: {results_json}")
+        return results
+
+    def track_task(self, task):
+        """Keep track of the state of 'task' for the task monitor.
+
+        Once done, the outcome of 'task' is handed to the result sink and the app
+        doesn't keep a reference to it any more.
+        """
+        self.running_tasks.add(task)
+        self._task_changed(task, "running")
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task):
+        self.running_tasks.discard(task)
+        self.task_counts["running"] -= 1
+        record = {
+            "name": task.get_name(),
+            "state": "done",
+            "result": None,
+            "exception": None,
+        }
+        if task.cancelled():
+            record["state"] = "cancelled"
+            record["exception"] = "cancelled"
+        elif task.exception() is not None:
+            record["state"] = "failed"
+            record["exception"] = str(task.exception())
+        else:
+            record["result"] = task.result()
+        self._task_changed(task, record["state"])
+        self.result_summary.add(record)
+        self.result_sink.add(record)
+
+    def _task_changed(self, task, state):
+        self.task_counts[state] += 1
+        if len(self.task_changes) == self.task_changes_maxlen:
+            self.task_changes_dropped += 1
+        self.task_changes.append({"name": task.get_name(), "state": state})
+        self.task_version += 1
 
     async def task_monitor(self):
-        """A tasks monitor."""
-        tasks_running = []
-        tasks_done = []
-        tasks_failed = []
-
-        for task in self.tasks:
-            task_name = task.get_name()
-            if task.done():
-                if task.exception():
-                    tasks_failed.append(task_name)
-                else:
-                    tasks_done.append(task_name)
-            else:
-                tasks_running.append(task_name)
+        """A tasks monitor.
+
+        Publishes the task counts and the state changes since the last record, if
+        anything changed at all. The cost doesn't depend on the number of tasks.
+        """
+        if self.task_version == self.task_monitor_version:
+            return None
+
+        record = {state: {"count": count} for state, count in self.task_counts.items()}
+        record["changes"] = list(self.task_changes)
+        record["changes_dropped"] = self.task_changes_dropped
+        record["version"] = self.task_version
+
+        self.task_changes.clear()
+        self.task_changes_dropped = 0
+        self.task_monitor_version = self.task_version
 
-        record = {
-            "running": {
-                "count": len(tasks_running),
-                "tasks": tasks_running,
-            },
-            "done": {
-                "count": len(tasks_done),
-                "tasks": tasks_done,
-            },
-            "failed": {
-                "count": len(tasks_failed),
-                "tasks": tasks_failed,
-            },
-        }
         logger.debug(json.dumps(record, indent=4))
-        await app_messenger.publish(f"{app_name}:task_monitor", record)
-        await app_messenger.set(f"{app_name}:task_monitor", record)
+        await app_messenger.publish_and_set(f"{self.name}:task_monitor", record)
+        app_timeseries.store.add_record(f"{self.name}:task_monitor", self.task_counts)
+
+        return record
+
+    async def loop_monitor(self):
+        """An event loop monitor.
+
+        Publishes a histogram of the loop lag and the stalls longer than
+        'slow_callback_duration' since the last record, each with the name of the
+        blocking task and a snapshot of its stack.
+        """
+        if not self.loop_monitoring.running:
+            self.loop_monitoring.start()
+
+        record = self.loop_monitoring.snapshot()
+        logger.debug(json.dumps(record["lag"], indent=log_indent))
+        await app_messenger.publish_and_set(f"{self.name}:loop_monitor", record)
+
+        return record
+
+    async def periodicals_monitor(self):
+        """Report tick, drop and coalesce counts of periodicals.
 
-    def periodicals_monitor(self):
+        For observed periodicals, see observe, the measured frequency and call
+        statistics are added.
+        """
         record = {}
-        for _uuid, periodical_timing in self.periodicals_timing.items():
-            ts = np.array(periodical_timing)
-            f = 1 / np.diff(ts).mean()
-            task_name = self.periodicals[_uuid]
-            record[task_name] = f
+        for _uuid, statistics in self.scheduler.statistics().items():
+            if _uuid in self.task_statistics:
+                call_statistics = self.task_statistics[_uuid].snapshot()
+                statistics["frequency"] = call_statistics["rate"]
+                statistics["calls"] = call_statistics
+            task_name = statistics.pop("name")
+            record[task_name] = statistics
         logger.debug(json.dumps(record, indent=log_indent))
+        await app_messenger.publish_and_set(f"{self.name}:periodicals_monitor", record)
+
+        return record
+
+    async def serve_metrics(self, port, host="0.0.0.0"):
+        """Serve the metrics of the app and the messenger, see async_app.metrics."""
+        app_metrics.registry.add_collector(self.collect_metrics)
+        try:
+            await app_metrics.serve(port, host)
+        finally:
+            app_metrics.registry.remove_collector(self.collect_metrics)
+
+    def collect_metrics(self):
+        """Copy task counts, periodicals and call statistics and the loop lag.
+
+        Called for every scrape. The app keeps all of them anyway, so running tasks
+        don't pay for metrics. The samples are created once per task and updated in
+        place, see app_metrics.Registry.
+        """
+        if self._app_samples is None:
+            self._app_samples = self._create_app_samples()
+        running, finished, lag = self._app_samples
+        task_counts = self.task_counts
+        running.value = task_counts["running"]
+        for state, sample in finished.items():
+            sample.value = task_counts[state]
+
+        entries = self.scheduler.entries
+        periodicals = self._periodical_samples
+        for uid, entry in entries.items():
+            samples = periodicals.get(uid, None)
+            if samples is None:
+                samples = periodicals[uid] = self._create_samples(
+                    periodical_metrics, uid
+                )
+            ticks, dropped, coalesced, cancelled, running, queued = samples
+            ticks.value = entry.ticks
+            dropped.value = entry.dropped
+            coalesced.value = entry.coalesced
+            cancelled.value = entry.cancelled
+            running.value = len(entry.running)
+            queued.value = entry.queued
+        # failing periodicals are removed from the scheduler
+        if len(periodicals) > len(entries):
+            for uid in [uid for uid in periodicals if uid not in entries]:
+                self._remove_samples(periodical_metrics, uid)
+                del periodicals[uid]
+
+        calls = self._call_samples
+        for uid, statistics in self.task_statistics.items():
+            samples = calls.get(uid, None)
+            if samples is None:
+                if not statistics.count:
+                    continue
+                samples = calls[uid] = self._create_samples(call_metrics, uid)
+                # count at the last scrape, the quantiles only change with calls
+                samples.append(None)
+            if samples[-1] == statistics.count:
+                continue
+            samples[-1] = statistics.count
+            count, failed, p50, p90, p99 = samples[:-1]
+            count.value = statistics.count
+            failed.value = statistics.failed
+            p50.value, p90.value, p99.value = statistics.durations.quantiles(
+                (0.5, 0.9, 0.99)
+            )
+
+        if self.loop_monitoring.running:
+            lag.set_counts(self.loop_monitoring.histogram, self.loop_monitoring.lag_sum)
+
+    def _create_app_samples(self):
+        registry = app_metrics.registry
+        running = registry.gauge(
+            "async_app_tasks_running", "Tasks running at the moment.", ("app",)
+        ).labels(self.name)
+        finished = registry.counter(
+            "async_app_tasks_finished_total",
+            "Tasks finished, by their final state.",
+            ("app", "state"),
+        )
+        lag = registry.histogram(
+            "async_app_loop_lag_seconds",
+            "Lag of the event loop.",
+            ("app",),
+            buckets=lag_buckets,
+        )
+        return (
+            running,
+            {
+                state: finished.labels(self.name, state)
+                for state in ("done", "failed", "cancelled")
+            },
+            lag.labels(self.name),
+        )
+
+    def _task_samples(self, metrics, uid):
+        """Yield the metric families of 'metrics' and the label values for 'uid'."""
+        registry = app_metrics.registry
+        labels = (self.name, self.task_names[uid], uid)
+        for name, kind, documentation, quantile in metrics:
+            if quantile is None:
+                metric = getattr(registry, kind)(name, documentation, task_labels)
+                yield metric, labels
+            else:
+                metric = getattr(registry, kind)(
+                    name, documentation, task_labels + ("quantile",)
+                )
+                yield metric, labels + (quantile,)
+
+    def _create_samples(self, metrics, uid):
+        return [
+            metric.labels(*labels)
+            for metric, labels in self._task_samples(metrics, uid)
+        ]
+
+    def _remove_samples(self, metrics, uid):
+        for metric, labels in self._task_samples(metrics, uid):
+            metric.remove(*labels)
 
     def exit(self, *args):
-        """Exit hook."""
+        """Exit hook.
+
+        Safe to use as signal handler or from other threads. Everything waiting on
+        app_state is woken up immediately, tasks still running after
+        'drain_timeout' seconds are cancelled.
+        """
         logger.info("Exit requested. GoodBye")
-        app_state.keep_running = False
+        if self._loop is None or self._loop.is_closed():
+            app_state.stop()
+            return
+        self._loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self):
+        app_state.stop()
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self.drain(), name="drain")
+
+    async def drain(self):
+        """Cancel the tasks still running after 'drain_timeout' seconds.
+
+        The scheduler drains its calls in flight with the same timeout and returns
+        its statistics, so it is left alone.
+        """
+        running = [
+            task for task in self.running_tasks if task is not self.scheduler_task
+        ]
+        if not running:
+            return
+
+        _, pending = await asyncio.wait(running, timeout=self.drain_timeout)
+        for task in pending:
+            logger.warning(f"Cancelling task {task.get_name()} on exit.")
+            task.cancel()
@@ -6,7 +6,10 @@ import click
 
 from async_app.logger import logger, set_verbosity
 from async_app.app import AsyncApp
+from async_app.tools import app_env_prefix
 
+# the event loop settings use the environment variables the app reads, so they may
+# also come from the config file, see config.read_config
 _async_app_options = [
     click.option(
         "-v",
@@ -52,6 +55,138 @@ _async_app_options = [
         show_default=True,
         help="Set periodicals monitoring frequency in Hz. '0' means to not monitor at all. ",
     ),
+    click.option(
+        "-lmf",
+        "--loop-monitoring-frequency",
+        envvar="LOOP_MONITORING_FREQUENCY",
+        type=int,
+        default=0,
+        show_default=True,
+        help="Set event loop monitoring frequency in Hz. Stalls longer than '--slow-callback-duration' are reported with a stack snapshot. '0' means to not monitor at all. ",
+    ),
+    click.option(
+        "--timeseries-queries/--no-timeseries-queries",
+        envvar="TIMESERIES_QUERIES",
+        default=False,
+        show_default=True,
+        help="Answer queries for the history of monitor records on '<app name>:timeseries'. The app then runs until it is asked to exit. ",
+    ),
+    click.option(
+        "--metrics-port",
+        envvar="METRICS_PORT",
+        type=int,
+        default=0,
+        show_default=True,
+        help="Serve metrics in the Prometheus text format at 'http://<host>:<port>/metrics'. Shards serve at consecutive ports. '0' means to not serve metrics. The app then runs until it is asked to exit. ",
+    ),
+    click.option(
+        "--metrics-host",
+        envvar="METRICS_HOST",
+        default="0.0.0.0",
+        show_default=True,
+        help="Address to serve metrics at, see '--metrics-port'. ",
+    ),
+    click.option(
+        "--task-statistics/--no-task-statistics",
+        envvar="TASK_STATISTICS",
+        default=False,
+        show_default=True,
+        help="Keep call count, rate and duration percentiles of all tasks. Single tasks opt in with 'monitor' in their description. ",
+    ),
+    click.option(
+        "-tps",
+        "--thread-pool-size",
+        envvar="THREAD_POOL_SIZE",
+        type=int,
+        default=0,
+        show_default=True,
+        help="Set the number of workers for tasks using the 'thread' executor. '0' means to use the Python default. A worker is added for each sync continuous task. ",
+    ),
+    click.option(
+        "-pps",
+        "--process-pool-size",
+        envvar="PROCESS_POOL_SIZE",
+        type=int,
+        default=0,
+        show_default=True,
+        help="Set the number of workers for tasks using the 'process' executor. '0' means to use the Python default. ",
+    ),
+    click.option(
+        "-w",
+        "--workers",
+        envvar="WORKERS",
+        type=int,
+        default=1,
+        show_default=True,
+        help="Set the number of processes to distribute continuous and periodic tasks over. Init and cleanup tasks run in every process, unless their description sets 'shard' to 'one'. ",
+    ),
+    click.option(
+        "--sharding",
+        envvar="SHARDING",
+        type=click.Choice(["weight", "hash"]),
+        default="weight",
+        show_default=True,
+        help="Set how tasks are distributed over the worker processes. ",
+    ),
+    click.option(
+        "--event-loop",
+        envvar=f"{app_env_prefix}_EVENT_LOOP",
+        type=click.Choice(["auto", "asyncio", "uvloop"]),
+        default=None,
+        help="Set the event loop implementation used by AsyncApp.serve. 'auto', the default, uses uvloop if installed. ",
+    ),
+    click.option(
+        "--debug/--no-debug",
+        envvar=f"{app_env_prefix}_DEBUG",
+        default=None,
+        help="Run the event loop in debug mode. Off by default. ",
+    ),
+    click.option(
+        "--slow-callback-duration",
+        envvar=f"{app_env_prefix}_SLOW_CALLBACK_DURATION",
+        type=float,
+        default=None,
+        help="Set the duration in seconds after which callbacks are reported as slow in debug mode. 0.1 by default. ",
+    ),
+    click.option(
+        "--drain-timeout",
+        envvar="DRAIN_TIMEOUT",
+        type=float,
+        default=5.0,
+        show_default=True,
+        help="Set the time in seconds tasks get to finish on exit, before they are cancelled. ",
+    ),
+    click.option(
+        "--messenger-backend",
+        envvar="MESSENGER_BACKEND",
+        type=click.Choice(["redis", "local"]),
+        default="redis",
+        show_default=True,
+        help="Set the backend of the messenger. 'local' keeps values and messages in the process, without serialization. ",
+    ),
+    click.option(
+        "--result-sink",
+        envvar="RESULT_SINK",
+        type=click.Choice(["ring", "jsonl", "none"]),
+        default="ring",
+        show_default=True,
+        help="Set where the outcomes of finished tasks go. 'ring' keeps the last '--result-buffer-size' ones, 'jsonl' appends them to '--result-file'. ",
+    ),
+    click.option(
+        "--result-buffer-size",
+        envvar="RESULT_BUFFER_SIZE",
+        type=int,
+        default=1000,
+        show_default=True,
+        help="Set the number of task outcomes kept by the 'ring' result sink. ",
+    ),
+    click.option(
+        "--result-file",
+        envvar="RESULT_FILE",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="Set the file the 'jsonl' result sink appends to. ",
+    ),
 ]
 
 
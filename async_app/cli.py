@@ -37,7 +37,7 @@ async def sleeper(sleep_for=0.5):
     """A repeating sleeper task."""
     while app_state.keep_running:
         logger.info(f"Message from the sleeper: Sleeping for {sleep_for} seconds.")
-        await asyncio.sleep(sleep_for)
+        await app_state.sleep(sleep_for)
 
 
 async def publish_ts():
@@ -56,7 +56,7 @@ async def exit_task(exit_after=10):
     """An exit task."""
     await asyncio.sleep(exit_after)
     logger.warning("Now exiting")
-    app_state.keep_running = False
+    app_state.stop()
 
 
 @click.command()
@@ -66,7 +66,7 @@ def main():
 
     max_runtime = 5
 
-    app = AsyncApp()
+    app = AsyncApp(debug=True)
     signal.signal(signal.SIGINT, app.exit)
     task_descriptions = [
         {
@@ -128,7 +128,7 @@ def main():
     for task_description in task_descriptions:
         app.add_task_description(task_description)
 
-    return asyncio.run(app.run(), debug=True)
+    return app.serve()
 
 
 if __name__ == "__main__":
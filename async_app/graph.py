@@ -0,0 +1,150 @@
+import asyncio
+
+from async_app.logger import logger
+
+
+class TaskGraph(object):
+    """Dependencies between tasks.
+
+    Task descriptions may name a resource they provide with 'provides', and list the
+    resources they need with 'depends_on'. The return value of a providing task is the
+    resource. It is passed as keyword argument of the same name to its dependents.
+    """
+
+    def __init__(self):
+        self.providers = {}
+        self.resources = {}
+        self.invalid = {}
+        self.timings = {}
+        self.names = {}
+        self.dependencies = {}
+
+    def build(self, task_descriptions):
+        """Collect providers and dependencies and check the graph for errors."""
+        loop = asyncio.get_running_loop()
+
+        for task_description in task_descriptions:
+            uid = task_description["uid"]
+            self.names[uid] = task_description["name"]
+
+            resource = task_description.get("provides", None)
+            if resource is None:
+                continue
+            if resource in self.providers:
+                self.invalid[uid] = f"Resource '{resource}' is provided more than once"
+                continue
+            self.providers[resource] = uid
+            self.resources[resource] = loop.create_future()
+
+        kinds = {
+            task_description["uid"]: task_description["kind"]
+            for task_description in task_descriptions
+        }
+        for task_description in task_descriptions:
+            uid = task_description["uid"]
+            self.dependencies[uid] = []
+            for resource in task_description.get("depends_on", ()):
+                if resource not in self.providers:
+                    self.invalid[uid] = f"Unknown dependency '{resource}'"
+                    continue
+                provider = self.providers[resource]
+                # continuous tasks wait for the init phase, init can't wait for them
+                if kinds[uid] == "init" and kinds[provider] == "continuous":
+                    self.invalid[uid] = (
+                        f"Init task depends on '{resource}' of a continuous task"
+                    )
+                    continue
+                self.dependencies[uid].append(provider)
+
+        self._check_cycles()
+
+        for uid, reason in self.invalid.items():
+            logger.error(f"Task {self.names[uid]} will not be run: {reason}.")
+
+    def _check_cycles(self):
+        # iterative depth first search, 'visiting' nodes on the stack close a cycle
+        state = {}
+        for root in self.dependencies:
+            if root in state:
+                continue
+            stack = [(root, iter(self.dependencies[root]))]
+            state[root] = "visiting"
+            while stack:
+                uid, dependencies = stack[-1]
+                for dependency in dependencies:
+                    if state.get(dependency) == "visiting":
+                        cycle = [node for node, _ in stack]
+                        cycle = cycle[cycle.index(dependency) :]
+                        for node in cycle:
+                            self.invalid[node] = "Circular dependency"
+                    elif dependency not in state:
+                        state[dependency] = "visiting"
+                        stack.append((dependency, iter(self.dependencies[dependency])))
+                        break
+                else:
+                    state[uid] = "done"
+                    stack.pop()
+
+    async def wait_for(self, task_description):
+        """Wait for the resources 'task_description' depends on and return them."""
+        uid = task_description["uid"]
+        if uid in self.invalid:
+            raise RuntimeError(self.invalid[uid])
+
+        resources = {}
+        for resource in task_description.get("depends_on", ()):
+            try:
+                resources[resource] = await self.resources[resource]
+            except Exception as e:
+                raise RuntimeError(f"Dependency '{resource}' failed") from e
+        return resources
+
+    def started(self, task_description):
+        loop = asyncio.get_running_loop()
+        self.timings[task_description["uid"]] = [loop.time(), None]
+
+    def finished(self, task_description, result=None, exception=None):
+        """Record the outcome of a task and hand out the resource it provides."""
+        uid = task_description["uid"]
+        if uid in self.timings:
+            self.timings[uid][1] = asyncio.get_running_loop().time()
+
+        resource = task_description.get("provides", None)
+        if resource is None or self.providers.get(resource) != uid:
+            return
+
+        future = self.resources[resource]
+        if future.done():
+            return
+        if exception is None:
+            future.set_result(result)
+        elif isinstance(exception, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(exception)
+            # dependents will report the failure, don't warn about it being unretrieved
+            future.exception()
+
+    def critical_path(self, uids):
+        """Return the chain of tasks that determined when the last of 'uids' finished.
+
+        Each entry of the path is a tuple of the task name and its duration in seconds.
+        """
+        finished = [uid for uid in uids if uid in self.timings and self.timings[uid][1]]
+        if not finished:
+            return []
+
+        path = []
+        uid = max(finished, key=lambda uid: self.timings[uid][1])
+        while uid is not None:
+            start, end = self.timings[uid]
+            path.append((self.names[uid], end - start))
+            # the dependency finishing last is the one we had to wait for
+            dependencies = [
+                dependency
+                for dependency in self.dependencies.get(uid, ())
+                if dependency in self.timings and self.timings[dependency][1]
+            ]
+            uid = max(dependencies, key=lambda uid: self.timings[uid][1], default=None)
+
+        return list(reversed(path))
@@ -0,0 +1,134 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from async_app.logger import logger
+
+# upper bounds in seconds of the loop lag histogram, the last bucket is unbounded
+lag_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class LoopMonitor(object):
+    """Measure the lag of the event loop and catch what blocks it.
+
+    A probe is scheduled every 'interval' seconds and records how late it runs. A
+    watchdog thread notices when the probe hasn't run for 'threshold' seconds and
+    takes a snapshot of the stack of the loop thread and the name of the current task.
+    """
+
+    def __init__(self, threshold=0.1, interval=None, max_stalls=100):
+        self.threshold = threshold
+        self.interval = interval if interval is not None else threshold / 2
+        self.histogram = [0] * (len(lag_buckets) + 1)
+        self.count = 0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        # the watchdog thread adds stalls, the loop updates and takes them
+        self._lock = threading.Lock()
+        self.stalls = deque(maxlen=max_stalls)
+        self.stalls_dropped = 0
+        self.heartbeat = None
+        self._expected = None
+        self._reported = None
+        self._loop = None
+        self._thread_id = None
+        self._handle = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._handle is not None
+
+    def start(self):
+        """Start probing the running loop and watching it from a thread."""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self.heartbeat = time.monotonic()
+        self._expected = self.heartbeat + self.interval
+        self._handle = self._loop.call_later(self.interval, self._probe)
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop_watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _probe(self):
+        now = time.monotonic()
+        lag = max(0.0, now - self._expected)
+        for bucket, bound in enumerate(lag_buckets):
+            if lag <= bound:
+                break
+        else:
+            bucket = len(lag_buckets)
+        self.histogram[bucket] += 1
+        self.count += 1
+        self.lag_sum += lag
+        self.lag_max = max(self.lag_max, lag)
+
+        # the stall caught by the watchdog is over, now its duration is known
+        if self._reported == self.heartbeat:
+            with self._lock:
+                if self.stalls:
+                    self.stalls[-1]["duration"] = lag + self.interval
+
+        self.heartbeat = now
+        self._expected = now + self.interval
+        self._handle = self._loop.call_later(self.interval, self._probe)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            heartbeat = self.heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked > self.threshold and heartbeat != self._reported:
+                self._reported = heartbeat
+                self._capture(blocked)
+
+    def _capture(self, blocked):
+        frame = sys._current_frames().get(self._thread_id, None)
+        stack = traceback.format_list(traceback.extract_stack(frame)) if frame else []
+        task = asyncio.current_task(self._loop)
+        stall = {
+            "task": task.get_name() if task is not None else None,
+            "duration": blocked,
+            "time": time.time(),
+            "stack": [line.rstrip() for line in stack],
+        }
+        with self._lock:
+            if len(self.stalls) == self.stalls.maxlen:
+                self.stalls_dropped += 1
+            self.stalls.append(stall)
+        logger.warning(
+            f"Event loop blocked for more than {blocked:.3f} s by task {stall['task']}"
+        )
+
+    def snapshot(self):
+        """Return the lag histogram and the stalls caught since the last snapshot."""
+        with self._lock:
+            stalls = list(self.stalls)
+            stalls_dropped = self.stalls_dropped
+            self.stalls.clear()
+            self.stalls_dropped = 0
+        return {
+            "lag": {
+                "count": self.count,
+                "mean": self.lag_sum / self.count if self.count else None,
+                "max": self.lag_max,
+                "buckets": list(lag_buckets) + ["inf"],
+                "histogram": list(self.histogram),
+            },
+            "stalls": stalls,
+            "stalls_dropped": stalls_dropped,
+        }
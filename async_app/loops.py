@@ -0,0 +1,81 @@
+import asyncio
+
+from async_app.logger import logger
+
+event_loops = ("auto", "asyncio", "uvloop")
+
+
+def loop_factory(event_loop="auto"):
+    """Return a function creating new event loops of kind 'event_loop'.
+
+    'auto' uses uvloop when it is installed and the asyncio loop otherwise.
+    """
+    if event_loop not in event_loops:
+        raise ValueError(f"Unknown {event_loop=}. Use one of {event_loops}.")
+
+    if event_loop in ("auto", "uvloop"):
+        try:
+            import uvloop
+
+            return uvloop.new_event_loop
+        except ImportError:
+            if event_loop == "uvloop":
+                logger.warning("uvloop is not installed. Using the asyncio event loop.")
+
+    return asyncio.new_event_loop
+
+
+def run(main, event_loop="auto", debug=False, slow_callback_duration=None):
+    """Run the coroutine 'main' on a new event loop of kind 'event_loop'.
+
+    'slow_callback_duration' sets the time in seconds after which callbacks are
+    reported as slow in debug mode.
+    """
+    factory = loop_factory(event_loop)
+
+    def configure(loop):
+        loop.set_debug(debug)
+        if slow_callback_duration is not None:
+            loop.slow_callback_duration = slow_callback_duration
+        logger.debug(f"Running on {type(loop).__module__} loop with {debug=}")
+
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(debug=debug, loop_factory=factory) as runner:
+            configure(runner.get_loop())
+            return runner.run(main)
+
+    # before Python 3.11, clean up like asyncio.run does
+    loop = factory()
+    configure(loop)
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            _cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def _cancel_all_tasks(loop):
+    """Cancel the tasks left on 'loop' and wait for them, see asyncio.run."""
+    tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    if not tasks:
+        return
+
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            loop.call_exception_handler(
+                {
+                    "message": "Unhandled exception during shutdown",
+                    "exception": task.exception(),
+                    "task": task,
+                }
+            )
@@ -1,13 +1,17 @@
 import asyncio
-import json
 from functools import wraps
 import os
+from fnmatch import fnmatchcase
+
+import socket
+import time
+from collections import deque, OrderedDict
 
-import redis.asyncio as redis
-import msgpack
 import asyncio_atexit
 
 from async_app.logger import logger
+from async_app.serializers import serializers
+import async_app.metrics as app_metrics
 import async_app.state as app_state  # to make app_state.keep_running a singleton
 
 # use most versatile approach as default. Set to 'json' for something more human readable
@@ -17,19 +21,838 @@ if "ASYNC_APP_REDIS_SERIALIZER" in os.environ.keys():
 
 logger.debug(f"Using {serializer=}")
 
+# 'redis' or 'local', see set_backend
+backends = ("redis", "local")
+backend_name = os.environ.get("ASYNC_APP_MESSENGER_BACKEND", "redis")
+
+# publish and set operations are sent in batches, see BatchWriter
+flush_interval = float(os.environ.get("ASYNC_APP_REDIS_FLUSH_INTERVAL", 0.001))
+max_batch_size = int(os.environ.get("ASYNC_APP_REDIS_BATCH_SIZE", 100))
+
+# messages wait in a bounded queue per listener, see ListenerQueue
+overflow_policies = ("block", "drop_oldest", "drop_newest")
+listener_queue_size = int(os.environ.get("ASYNC_APP_LISTENER_QUEUE_SIZE", 1000))
+
+# streams keep about this many entries, see append
+stream_maxlen = int(os.environ.get("ASYNC_APP_STREAM_MAXLEN", 10000))
+
+# values read by get may be cached for opted in namespaces, see enable_cache
+cache_size = int(os.environ.get("ASYNC_APP_CACHE_SIZE", 1024))
+cache_ttl = float(os.environ.get("ASYNC_APP_CACHE_TTL", 60))
+cached_namespaces = [
+    namespace
+    for namespace in os.environ.get("ASYNC_APP_CACHED_NAMESPACES", "").split(",")
+    if namespace
+]
+
+# operations, bytes and round trips to redis, see async_app.metrics
+_operations = app_metrics.registry.counter(
+    "async_app_messenger_operations_total",
+    "Values set and read, messages published and received, stream entries appended.",
+    ("operation",),
+)
+_operation_counts = {
+    operation: _operations.labels(operation)
+    for operation in ("set", "get", "publish", "receive", "append")
+}
+_bytes = app_metrics.registry.counter(
+    "async_app_messenger_bytes_total",
+    "Packed values and messages sent to and received from redis.",
+    ("direction",),
+)
+_bytes_sent = _bytes.labels("sent")
+_bytes_received = _bytes.labels("received")
+_round_trips = app_metrics.registry.histogram(
+    "async_app_messenger_round_trip_seconds",
+    "Duration of requests to redis, batched operations share a pipeline.",
+    ("request",),
+)
+_pipeline_round_trips = _round_trips.labels("pipeline")
+_get_round_trips = _round_trips.labels("get")
+
 # make sure a clean exit from redis is done
 _clean_exit_enabled = False
 
 
-if serializer == "msgpack":
-    packer = msgpack.packb
-    unpacker = msgpack.unpackb
-else:
-    packer = json.dumps
-    unpacker = json.loads
+packer, unpacker = serializers["msgpack" if serializer == "msgpack" else "json"]
+
+# serializer names by namespace or glob pattern, see set_serializer
+namespace_serializers = {}
+_serializer_cache = {}
+
+
+def set_serializer(namespace, name):
+    """Use the serializer 'name' for 'namespace', which may be a glob pattern.
+
+    Namespaces without a serializer of their own use the one set by the environment
+    variable ASYNC_APP_REDIS_SERIALIZER.
+    """
+    if name not in serializers:
+        raise ValueError(f"Unknown serializer {name=}. Use one of {list(serializers)}.")
+    namespace_serializers[namespace] = name
+    _serializer_cache.clear()
+
+
+def serializer_for(namespace):
+    """Return the packer and unpacker for 'namespace'."""
+    try:
+        return _serializer_cache[namespace]
+    except KeyError:
+        pass
+
+    name = namespace_serializers.get(namespace, None)
+    if name is None:
+        for pattern, pattern_name in namespace_serializers.items():
+            if fnmatchcase(namespace, pattern):
+                name = pattern_name
+                break
+    functions = serializers[name] if name is not None else (packer, unpacker)
+    # bounded, namespaces are few, but may be generated
+    if len(_serializer_cache) > 1024:
+        _serializer_cache.clear()
+    _serializer_cache[namespace] = functions
+    return functions
+
+
+class BatchWriter(object):
+    """Send publish and set operations to redis in batches.
+
+    Operations submitted within 'flush_interval' seconds, but no more than
+    'max_batch_size', go out as one pipeline. Callers wait until their batch is sent.
+    """
+
+    def __init__(self, client, flush_interval=0.001, max_batch_size=100):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.operations = []
+        self.batch = None
+        self._handle = None
+        # 'set' is shadowed by the messenger function of the same name
+        self._sending = []
+        self.batches = 0
+        self.operations_sent = 0
+
+    async def submit(self, operation, *args):
+        """Queue 'operation', a method name of the redis pipeline, with 'args'."""
+        if self.batch is None:
+            loop = asyncio.get_running_loop()
+            self.batch = loop.create_future()
+            self._handle = loop.call_later(self.flush_interval, self._flush)
+        self.operations.append((operation, args))
+        batch = self.batch
+        if len(self.operations) >= self.max_batch_size:
+            self._handle.cancel()
+            self._flush()
+        # the batch is shared, a cancelled caller must not cancel it for the others
+        await asyncio.shield(batch)
+
+    def _flush(self):
+        operations, batch = self.operations, self.batch
+        self.operations, self.batch, self._handle = [], None, None
+        task = asyncio.create_task(self._send(operations, batch))
+        self._sending.append(task)
+        task.add_done_callback(self._sending.remove)
+
+    async def _send(self, operations, batch):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for operation, args in operations:
+                    getattr(pipe, operation)(*args)
+                start = time.perf_counter()
+                await pipe.execute()
+                _pipeline_round_trips.observe(time.perf_counter() - start)
+        except Exception as e:
+            batch.set_exception(e)
+            # callers see the exception, don't warn about it being unretrieved
+            batch.exception()
+        else:
+            batch.set_result(None)
+            self.batches += 1
+            self.operations_sent += len(operations)
+
+    async def flush(self):
+        """Send pending operations right away and wait for all batches in flight."""
+        if self.batch is not None:
+            self._handle.cancel()
+            self._flush()
+        if self._sending:
+            await asyncio.wait(self._sending)
+
+
+class GetCache(object):
+    """Values read by 'get' for opted in namespaces.
+
+    Holds up to 'maxsize' values, evicting the least recently used one. Values expire
+    after 'ttl' seconds, in case an invalidation was missed.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.namespaces = []
+        self._enabled = {}
+        # changes with every invalidation, see store
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def enable(self, namespace):
+        """Cache values of 'namespace', which may be a glob pattern."""
+        self.namespaces.append(namespace)
+        self._enabled.clear()
+
+    def prefixes(self):
+        """Key prefixes covering the opted in namespaces."""
+        return {
+            namespace.split("*")[0].split("?")[0].split("[")[0]
+            for namespace in self.namespaces
+        }
+
+    def is_enabled(self, namespace):
+        enabled = self._enabled.get(namespace, None)
+        if enabled is None:
+            enabled = any(
+                fnmatchcase(namespace, pattern) for pattern in self.namespaces
+            )
+            if len(self._enabled) > self.maxsize:
+                self._enabled.clear()
+            self._enabled[namespace] = enabled
+        return enabled
+
+    def lookup(self, namespace):
+        """Return whether a value for 'namespace' is cached and the value."""
+        entry = self.entries.get(namespace, None)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return False, None
+        self.entries.move_to_end(namespace)
+        self.hits += 1
+        return True, entry[1]
+
+    def store(self, namespace, value, generation):
+        """Cache 'value', unless anything was invalidated since 'generation'."""
+        if generation != self.generation:
+            return
+        self.entries[namespace] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(namespace)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, namespaces=None):
+        """Drop the values of 'namespaces', or of all namespaces for None."""
+        self.generation += 1
+        if namespaces is None:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            return
+        for namespace in namespaces:
+            if self.entries.pop(namespace, None) is not None:
+                self.invalidations += 1
+
+    def statistics(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+
+class DispatchTable(object):
+    """Callbacks of listeners by channel and by glob pattern."""
+
+    def __init__(self):
+        self.channels = {}
+        self.patterns = {}
+        self.delivered = 0
+
+    @staticmethod
+    def is_pattern(namespace):
+        return any(character in namespace for character in "*?[")
+
+    def add(self, namespace, callback):
+        """Add 'callback' for 'namespace'. Returns whether 'namespace' is new."""
+        table = self.patterns if self.is_pattern(namespace) else self.channels
+        callbacks = table.get(namespace, None)
+        is_new = callbacks is None
+        if is_new:
+            callbacks = table[namespace] = []
+        callbacks.append((callback, asyncio.iscoroutinefunction(callback)))
+        return is_new
+
+    def remove(self, namespace, callback):
+        """Remove 'callback' for 'namespace'. Returns whether 'namespace' is unused now."""
+        table = self.patterns if self.is_pattern(namespace) else self.channels
+        callbacks = table.get(namespace, None)
+        if callbacks is None:
+            return False
+        for entry in callbacks:
+            if entry[0] is callback:
+                callbacks.remove(entry)
+                break
+        if callbacks:
+            return False
+        del table[namespace]
+        return True
+
+    def match(self, channel):
+        """Return the callbacks for 'channel' and all patterns matching it."""
+        callbacks = list(self.channels.get(channel, ()))
+        for pattern, pattern_callbacks in self.patterns.items():
+            if fnmatchcase(channel, pattern):
+                callbacks.extend(pattern_callbacks)
+        return callbacks
+
+    def __bool__(self):
+        return bool(self.channels or self.patterns)
+
+    async def deliver(self, callbacks, data):
+        for callback, callback_is_async in callbacks:
+            try:
+                if callback_is_async:
+                    await callback(data)
+                else:
+                    callback(data)
+            except Exception as e:
+                logger.error(f"Listener {callback!r} failed with {e!r}")
+        self.delivered += 1
+
+
+class SubscriptionManager(object):
+    """Serve all listeners of a process from a single pubsub connection.
+
+    Channels and glob patterns are (p)subscribed when their first callback is added
+    and unsubscribed when their last one is removed. Messages are routed to the
+    callbacks by a lookup of their channel or pattern.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.pubsub = None
+        self.table = DispatchTable()
+        self._loop = None
+        self._reader = None
+
+    def _connection(self):
+        loop = asyncio.get_running_loop()
+        # connections can't be shared between event loops
+        if self._loop is not loop:
+            self.pubsub = self.client.pubsub()
+            self.table = DispatchTable()
+            self._loop = loop
+            self._reader = None
+        return self.pubsub
+
+    async def subscribe(self, namespace, callback):
+        """Call 'callback' with the data of messages to 'namespace', a channel or glob."""
+        pubsub = self._connection()
+        if self.table.add(namespace, callback):
+            if self.table.is_pattern(namespace):
+                await pubsub.psubscribe(namespace)
+            else:
+                await pubsub.subscribe(namespace)
+
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._serve(), name="subscriptions")
+
+    async def unsubscribe(self, namespace, callback):
+        if self._loop is not asyncio.get_running_loop():
+            return
+
+        if self.table.remove(namespace, callback):
+            if self.table.is_pattern(namespace):
+                await self.pubsub.punsubscribe(namespace)
+            else:
+                await self.pubsub.unsubscribe(namespace)
+
+    async def _serve(self):
+        await app_state.run_until_stopped(self._read())
+
+    async def _read(self):
+        pubsub = self.pubsub
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=None
+            )
+            # deliver whatever is buffered already, before waiting on the socket again
+            while message is not None:
+                await self._deliver(message)
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=0
+                )
+
+    async def _deliver(self, message):
+        if message["type"] == "pmessage":
+            callbacks = self.table.patterns.get(message["pattern"].decode(), ())
+        else:
+            callbacks = self.table.channels.get(message["channel"].decode(), ())
+        if callbacks:
+            _bytes_received.inc(len(message["data"]))
+            _, unpack = serializer_for(message["channel"].decode())
+            await self.table.deliver(list(callbacks), unpack(message["data"]))
+
+    async def close(self):
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        await self.pubsub.aclose()
+        self._loop = None
+
+
+class RedisBackend(object):
+    """Values and messages go through a redis server, packed by namespace.
+
+    See set_serializer.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            # imported here, apps not using redis don't pay for it
+            import redis.asyncio as redis
+
+            client = redis.Redis()
+        self.client = client
+        self.writer = BatchWriter(self.client, flush_interval, max_batch_size)
+        self.subscriptions = SubscriptionManager(self.client)
+
+        self.cache = GetCache(cache_size, cache_ttl)
+        for namespace in cached_namespaces:
+            self.cache.enable(namespace)
+        # server assisted invalidation of the cache, see _track
+        self._tracked_prefixes = frozenset()
+        self._tracking = None
+        self._client_id = None
+        self._invalidations = None
+        self._invalidations_reader = None
+        self._tracking_loop = None
+
+    async def set(self, namespace, data):
+        pack, _ = serializer_for(namespace)
+        packed = pack(data)
+        _bytes_sent.inc(len(packed))
+        if self.cache.is_enabled(namespace):
+            self.cache.invalidate([namespace])
+        await self.writer.submit("set", namespace, packed)
+
+    async def get(self, namespace):
+        # read our own writes
+        await self.writer.flush()
+        _, unpack = serializer_for(namespace)
+        if not self.cache.is_enabled(namespace):
+            return unpack(await self._get(namespace))
+
+        found, value = self.cache.lookup(namespace)
+        if found:
+            return value
+        await self._track()
+        generation = self.cache.generation
+        value = unpack(await self._get(namespace))
+        self.cache.store(namespace, value, generation)
+        return value
+
+    async def _get(self, namespace):
+        start = time.perf_counter()
+        packed = await self.client.get(namespace)
+        _get_round_trips.observe(time.perf_counter() - start)
+        if packed is not None:
+            _bytes_received.inc(len(packed))
+        return packed
+
+    async def _track(self):
+        """Have redis tell about changes of keys with the prefixes of cached namespaces.
+
+        Uses client tracking in broadcasting mode, redirected to a connection
+        subscribed to '__redis__:invalidate'. Without it, cached values only expire.
+        """
+        loop = asyncio.get_running_loop()
+        if self._tracking_loop is not loop:
+            # connections can't be shared between event loops
+            self._tracked_prefixes = frozenset()
+            self._tracking = None
+            self._invalidations = None
+            self._tracking_loop = loop
+
+        prefixes = self.cache.prefixes() - self._tracked_prefixes
+        if not prefixes:
+            return
+        # don't try again on every get, if tracking fails
+        self._tracked_prefixes |= prefixes
+
+        try:
+            if self._invalidations is None:
+                pubsub = self.client.pubsub()
+                await pubsub.connect()
+                await pubsub.connection.send_command("CLIENT", "ID")
+                self._client_id = await pubsub.connection.read_response()
+                await pubsub.subscribe(**{"__redis__:invalidate": self._on_invalidate})
+                self._invalidations = pubsub
+                self._invalidations_reader = asyncio.create_task(
+                    self._read_invalidations(), name="cache_invalidations"
+                )
+                self._tracking = await self.client.connection_pool.get_connection()
+
+            command = ["CLIENT", "TRACKING", "ON", "REDIRECT", self._client_id, "BCAST"]
+            for prefix in sorted(prefixes):
+                command += ["PREFIX", prefix]
+            await self._tracking.send_command(*command)
+            await self._tracking.read_response()
+        except Exception as e:
+            logger.warning(
+                f"Client tracking for {prefixes} failed with {e!r}. Cached values "
+                f"expire after {self.cache.ttl} s."
+            )
+
+    async def _read_invalidations(self):
+        # messages go to _on_invalidate, get_message returns None for them
+        await app_state.run_until_stopped(self._read_invalidations_forever())
+
+    async def _read_invalidations_forever(self):
+        while True:
+            await self._invalidations.get_message(timeout=None)
+
+    def _on_invalidate(self, message):
+        keys = message["data"]
+        if keys is None or isinstance(keys, bytes):
+            # the whole database was flushed
+            self.cache.invalidate()
+        else:
+            self.cache.invalidate([key.decode() for key in keys])
+
+    async def publish(self, namespace, data):
+        pack, _ = serializer_for(namespace)
+        packed = pack(data)
+        _bytes_sent.inc(len(packed))
+        await self.writer.submit("publish", namespace, packed)
+
+    async def publish_and_set(self, namespace, data):
+        pack, _ = serializer_for(namespace)
+        packed = pack(data)
+        _bytes_sent.inc(2 * len(packed))
+        if self.cache.is_enabled(namespace):
+            self.cache.invalidate([namespace])
+        await asyncio.gather(
+            self.writer.submit("publish", namespace, packed),
+            self.writer.submit("set", namespace, packed),
+        )
+
+    async def subscribe(self, namespace, callback):
+        await self.subscriptions.subscribe(namespace, callback)
+
+    async def unsubscribe(self, namespace, callback):
+        await self.subscriptions.unsubscribe(namespace, callback)
+
+    async def append(self, namespace, data, maxlen):
+        pack, _ = serializer_for(namespace)
+        packed = pack(data)
+        _bytes_sent.inc(len(packed))
+        await self.writer.submit(
+            "xadd", namespace, {b"data": packed}, "*", maxlen, True
+        )
 
+    async def consume(
+        self, namespace, group, consumer, callback, batch_size, block, min_idle_time
+    ):
+        from redis.exceptions import ResponseError
 
-_r = redis.Redis()
+        try:
+            await self.client.xgroup_create(namespace, group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        loop = asyncio.get_running_loop()
+        claim_start, next_claim = "0-0", loop.time()
+        while app_state.keep_running:
+            # take over entries a failed or vanished consumer left pending
+            if loop.time() >= next_claim:
+                response = await self.client.xautoclaim(
+                    namespace,
+                    group,
+                    consumer,
+                    min_idle_time,
+                    start_id=claim_start,
+                    count=batch_size,
+                )
+                claim_start, entries = response[0], response[1]
+                await self._handle(namespace, group, callback, entries)
+                if claim_start in (b"0-0", "0-0"):
+                    next_claim = loop.time() + min_idle_time / 1000
+
+            response = await self.client.xreadgroup(
+                group, consumer, {namespace: ">"}, count=batch_size, block=block
+            )
+            for _, entries in response or ():
+                await self._handle(namespace, group, callback, entries)
+
+    async def _handle(self, namespace, group, callback, entries):
+        if not entries:
+            return
+
+        _, unpack = serializer_for(namespace)
+        ids = [entry_id for entry_id, _ in entries]
+        _bytes_received.inc(
+            sum(len(fields[b"data"]) for _, fields in entries if fields)
+        )
+        # entries deleted by trimming while pending come without fields
+        batch = [unpack(fields[b"data"]) for _, fields in entries if fields]
+        if batch and not await _call(callback, batch):
+            # stays pending, to be claimed again after 'min_idle_time'
+            return
+        await self.client.xack(namespace, group, *ids)
+
+    async def close(self):
+        await self.writer.flush()
+        await self.subscriptions.close()
+        if self._tracking_loop is asyncio.get_running_loop():
+            if self._invalidations_reader is not None:
+                self._invalidations_reader.cancel()
+                await asyncio.gather(self._invalidations_reader, return_exceptions=True)
+            if self._invalidations is not None:
+                await self._invalidations.aclose()
+            if self._tracking is not None:
+                await self._tracking.disconnect()
+                await self.client.connection_pool.release(self._tracking)
+            self._tracking_loop = None
+        await self.client.aclose()
+
+
+class LocalBackend(object):
+    """Values and messages stay in this process.
+
+    Nothing is serialized, listeners get references to the published objects and
+    must not modify them.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.streams = {}
+        self.table = DispatchTable()
+        self.queue = None
+        self._loop = None
+        self._reader = None
+
+    async def set(self, namespace, data):
+        self.values[namespace] = data
+
+    async def get(self, namespace):
+        return self.values.get(namespace, None)
+
+    async def publish(self, namespace, data):
+        # like redis, drop messages nobody listens to
+        if self.table and self._loop is asyncio.get_running_loop():
+            self.queue.put_nowait((namespace, data))
+
+    async def publish_and_set(self, namespace, data):
+        await self.set(namespace, data)
+        await self.publish(namespace, data)
+
+    async def subscribe(self, namespace, callback):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.queue = asyncio.Queue()
+            self.table = DispatchTable()
+            self._loop = loop
+            self._reader = None
+
+        self.table.add(namespace, callback)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._serve(), name="local_bus")
+
+    async def unsubscribe(self, namespace, callback):
+        if self._loop is asyncio.get_running_loop():
+            self.table.remove(namespace, callback)
+
+    def _stream(self, namespace, maxlen=None):
+        stream = self.streams.get(namespace, None)
+        if stream is None:
+            stream = self.streams[namespace] = LocalStream(maxlen or stream_maxlen)
+        return stream
+
+    async def append(self, namespace, data, maxlen):
+        self._stream(namespace, maxlen).append(data)
+
+    async def consume(
+        self, namespace, group, consumer, callback, batch_size, block, min_idle_time
+    ):
+        # consumers of a group share its cursor. Nothing is left pending, a failed
+        # batch is lost like in a crashed process.
+        stream = self._stream(namespace)
+        while app_state.keep_running:
+            batch = stream.read(group, batch_size)
+            if batch:
+                await _call(callback, batch)
+            else:
+                await app_state.run_until_stopped(stream.appended.wait())
+
+    async def _serve(self):
+        await app_state.run_until_stopped(self._read())
+
+    async def _read(self):
+        while True:
+            namespace, data = await self.queue.get()
+            await self.table.deliver(self.table.match(namespace), data)
+
+    async def close(self):
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._loop = None
+
+
+class LocalStream(object):
+    """The last 'maxlen' entries of a stream and the read position of each group."""
+
+    def __init__(self, maxlen):
+        self.entries = deque(maxlen=maxlen)
+        self.appended_count = 0
+        self.cursors = {}
+        self.appended = asyncio.Event()
+
+    def append(self, data):
+        self.entries.append(data)
+        self.appended_count += 1
+        # wake up the waiting consumers, later ones wait for the next append
+        self.appended.set()
+        self.appended = asyncio.Event()
+
+    def read(self, group, count):
+        """Return up to 'count' entries 'group' has not read yet."""
+        first = self.appended_count - len(self.entries)
+        cursor = max(self.cursors.get(group, 0), first)
+        end = min(cursor + count, self.appended_count)
+        self.cursors[group] = end
+        return [self.entries[index - first] for index in range(cursor, end)]
+
+
+async def _call(callback, batch):
+    """Call 'callback' with 'batch' and return whether it succeeded."""
+    try:
+        if asyncio.iscoroutinefunction(callback):
+            await callback(batch)
+        else:
+            callback(batch)
+    except Exception as e:
+        logger.error(f"Stream consumer {callback!r} failed with {e!r}")
+        return False
+    return True
+
+
+class ListenerQueue(object):
+    """A bounded queue between the delivery of messages and the callback of a listener.
+
+    'workers' tasks take messages from the queue and call 'callback'. Sync callbacks
+    run on the default thread pool for the 'thread' executor. When the queue is full,
+    the 'overflow' policy decides: 'block' holds up delivery to all listeners of the
+    process, 'drop_oldest' and 'drop_newest' drop a message.
+    """
+
+    def __init__(
+        self,
+        namespace,
+        callback,
+        maxsize=1000,
+        workers=1,
+        overflow="block",
+        executor="loop",
+    ):
+        if overflow not in overflow_policies:
+            raise ValueError(f"Unknown {overflow=}. Use one of {overflow_policies}.")
+        if executor not in ("loop", "thread"):
+            raise ValueError(f"Unknown {executor=}. Use 'loop' or 'thread'.")
+
+        self.namespace = namespace
+        self.callback = callback
+        self.callback_is_async = asyncio.iscoroutinefunction(callback)
+        self.workers = workers
+        self.overflow = overflow
+        self.executor = executor
+        self.queue = asyncio.Queue(maxsize)
+        self.max_depth = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def put(self, data):
+        _operation_counts["receive"].inc()
+        queue = self.queue
+        if queue.full():
+            if self.overflow == "drop_newest":
+                self.dropped += 1
+                return
+            if self.overflow == "drop_oldest":
+                queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+        await queue.put(data)
+        self.max_depth = max(self.max_depth, queue.qsize())
+
+    async def run(self):
+        """Run the workers until cancelled."""
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await self.queue.get()
+            try:
+                if self.callback_is_async:
+                    await self.callback(data)
+                elif self.executor == "thread":
+                    await loop.run_in_executor(None, self.callback, data)
+                else:
+                    self.callback(data)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Listener {self.callback!r} failed with {e!r}")
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    def statistics(self):
+        return {
+            "namespace": self.namespace,
+            "depth": self.queue.qsize(),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "failed": self.failed,
+            "workers": self.workers,
+        }
+
+
+_listener_queues = []
+_backend = None
+
+
+def set_backend(name):
+    """Use the messenger backend 'name', one of 'redis' and 'local'.
+
+    The default is taken from the environment variable ASYNC_APP_MESSENGER_BACKEND.
+    """
+    global _backend, backend_name
+
+    if name not in backends:
+        raise ValueError(f"Unknown messenger backend {name=}. Use one of {backends}.")
+    backend_name = name
+    _backend = RedisBackend() if name == "redis" else LocalBackend()
+    logger.debug(f"Using messenger {backend_name=}")
+    return _backend
+
+
+def get_backend():
+    if _backend is None:
+        set_backend(backend_name)
+    return _backend
 
 
 async def enable_clean_exit():
@@ -43,41 +866,196 @@ async def enable_clean_exit():
 
 async def set(namespace, data):
     await enable_clean_exit()
-    await _r.set(namespace, packer(data))
+    _operation_counts["set"].inc()
+    await get_backend().set(namespace, data)
 
 
 async def get(namespace):
     await enable_clean_exit()
-    value = unpacker(await _r.get(namespace))
+    _operation_counts["get"].inc()
+    value = await get_backend().get(namespace)
     return value
 
 
 async def publish(namespace, data):
     await enable_clean_exit()
-    await _r.publish(namespace, packer(data))
+    _operation_counts["publish"].inc()
+    await get_backend().publish(namespace, data)
 
 
-async def listener(namespace, callback):
+async def publish_and_set(namespace, data):
+    """Publish 'data' to 'namespace' and store it there, packing it only once."""
     await enable_clean_exit()
+    _operation_counts["publish"].inc()
+    _operation_counts["set"].inc()
+    await get_backend().publish_and_set(namespace, data)
 
-    callback_is_async = True if asyncio.iscoroutinefunction(callback) else False
 
-    async with _r.pubsub() as pubsub:
-        await pubsub.subscribe(namespace)
+async def listener(
+    namespace,
+    callback,
+    queue_size=None,
+    workers=1,
+    overflow="block",
+    executor="loop",
+):
+    """Call 'callback' with the data of every message published to 'namespace'.
 
-        while app_state.keep_running:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message is not None:
-                data = unpacker(message["data"])
-                if callback_is_async:
-                    await callback(data)
-                else:
-                    callback(data)
-            else:
-                # be nice to the system
-                # TODO: make this configurable to allow adjusting the responsiveness
-                await asyncio.sleep(0.05)
+    'namespace' may be a glob pattern like 'async_app:*'. All listeners share one
+    connection. Messages wait for 'callback' in a queue of 'queue_size' entries,
+    ASYNC_APP_LISTENER_QUEUE_SIZE by default, served by 'workers' tasks. See
+    ListenerQueue for 'overflow' and 'executor'. Returns once the app is asked to stop.
+    """
+    await enable_clean_exit()
+
+    listener_queue = ListenerQueue(
+        namespace,
+        callback,
+        queue_size or listener_queue_size,
+        workers,
+        overflow,
+        executor,
+    )
+    # the same bound method is needed to unsubscribe
+    put = listener_queue.put
+    backend = get_backend()
+    await backend.subscribe(namespace, put)
+    _listener_queues.append(listener_queue)
+    try:
+        await app_state.run_until_stopped(listener_queue.run())
+    finally:
+        _listener_queues.remove(listener_queue)
+        _forget_listener_metrics(namespace)
+        await backend.unsubscribe(namespace, put)
+
+
+def listener_statistics():
+    """Return queue depth, drop and processing counts of the running listeners."""
+    return [listener_queue.statistics() for listener_queue in _listener_queues]
+
+
+async def append(namespace, data, maxlen=None):
+    """Append 'data' to the stream 'namespace', keeping about 'maxlen' entries.
+
+    Unlike published messages, entries stay available for consumers that are slow
+    or not running at the moment.
+    """
+    await enable_clean_exit()
+    _operation_counts["append"].inc()
+    await get_backend().append(namespace, data, maxlen or stream_maxlen)
+
+
+async def consumer(
+    namespace,
+    group,
+    callback,
+    name=None,
+    batch_size=100,
+    block=1000,
+    min_idle_time=60000,
+):
+    """Call 'callback' with lists of up to 'batch_size' entries of the stream 'namespace'.
+
+    Consumers of the same 'group' share the work, across processes. An entry is
+    acknowledged once 'callback' returns without an exception. Entries left pending
+    for 'min_idle_time' milliseconds, e.g. by a crashed consumer, are claimed again.
+    'block' is the time in milliseconds to wait for new entries per read. Returns once
+    the app is asked to stop.
+    """
+    await enable_clean_exit()
+
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    await app_state.run_until_stopped(
+        get_backend().consume(
+            namespace, group, name, callback, batch_size, block, min_idle_time
+        )
+    )
+
+
+def enable_cache(namespace):
+    """Cache values 'get' reads from 'namespace', which may be a glob pattern.
+
+    For redis, the cache is kept up to date by client tracking and holds
+    ASYNC_APP_CACHE_SIZE values for at most ASYNC_APP_CACHE_TTL seconds. Cached
+    values are shared between callers and must not be modified. The local backend
+    doesn't need a cache.
+    """
+    backend = get_backend()
+    if hasattr(backend, "cache"):
+        backend.cache.enable(namespace)
+
+
+def cache_statistics():
+    """Return size, hit, miss, invalidation and eviction counts of the get cache."""
+    backend = get_backend()
+    if not hasattr(backend, "cache"):
+        return {}
+    return backend.cache.statistics()
+
+
+_listener_metrics = (
+    app_metrics.registry.gauge(
+        "async_app_messenger_listener_queue_depth",
+        "Messages waiting for the callback of a listener.",
+        ("namespace",),
+    ),
+    app_metrics.registry.counter(
+        "async_app_messenger_listener_dropped_total",
+        "Messages dropped by the overflow policy of a listener.",
+        ("namespace",),
+    ),
+    app_metrics.registry.counter(
+        "async_app_messenger_listener_failed_total",
+        "Messages the callback of a listener failed on.",
+        ("namespace",),
+    ),
+)
+# samples by namespace, for as long as it has listeners
+_listener_samples = {}
+_cache_events = app_metrics.registry.counter(
+    "async_app_messenger_cache_total",
+    "Hits, misses, invalidations and evictions of the get cache.",
+    ("event",),
+)
+_cache_samples = {
+    event: _cache_events.labels(event)
+    for event in ("hits", "misses", "invalidations", "evictions")
+}
+
+
+def _forget_listener_metrics(namespace):
+    if any(queue.namespace == namespace for queue in _listener_queues):
+        return
+    _listener_samples.pop(namespace, None)
+    for metric in _listener_metrics:
+        metric.remove(namespace)
+
+
+def _collect_metrics():
+    # listeners of the same namespace add up
+    for depth, dropped, failed in _listener_samples.values():
+        depth.value = dropped.value = failed.value = 0
+    for listener_queue in _listener_queues:
+        namespace = listener_queue.namespace
+        samples = _listener_samples.get(namespace, None)
+        if samples is None:
+            samples = _listener_samples[namespace] = [
+                metric.labels(namespace) for metric in _listener_metrics
+            ]
+        depth, dropped, failed = samples
+        depth.value += listener_queue.queue.qsize()
+        dropped.value += listener_queue.dropped
+        failed.value += listener_queue.failed
+
+    cache = getattr(_backend, "cache", None)
+    if cache is not None:
+        for event, sample in _cache_samples.items():
+            sample.value = getattr(cache, event)
+
+
+app_metrics.registry.add_collector(_collect_metrics)
 
 
 async def close_redis():
-    await _r.aclose()
+    """Close the connections of the messenger backend."""
+    await get_backend().close()
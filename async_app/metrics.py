@@ -0,0 +1,371 @@
+import asyncio
+import math
+from bisect import bisect_left
+
+from async_app.logger import logger
+import async_app.state as app_state
+
+# upper bounds in seconds, the last bucket is unbounded
+default_buckets = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+content_type = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format(value):
+    """Return 'value' as a Prometheus sample value, followed by a newline."""
+    if type(value) is int:
+        return b"%d\n" % value
+    value = float(value)
+    if math.isnan(value):
+        return b"NaN\n"
+    if math.isinf(value):
+        return b"+Inf\n" if value > 0 else b"-Inf\n"
+    return b"%r\n" % value
+
+
+def _format_bound(bound):
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class _Output(object):
+    """A growing buffer, reused for every rendering."""
+
+    def __init__(self, capacity=2**16):
+        self.buffer = bytearray(capacity)
+        self.size = 0
+
+    def write(self, data):
+        end = self.size + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(max(end, 2 * len(self.buffer)) - len(self.buffer)))
+        self.buffer[self.size : end] = data
+        self.size = end
+
+
+class _Value(object):
+    """A sample of a counter or gauge, with its line prefix encoded up front."""
+
+    __slots__ = ("prefix", "value")
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def render(self, output):
+        output.write(self.prefix)
+        output.write(_format(self.value))
+
+
+class _HistogramValue(object):
+    """Bucket counts, sum and count of the observations of a histogram."""
+
+    __slots__ = ("bounds", "prefixes", "counts", "sum", "count")
+
+    def __init__(self, bounds, prefixes):
+        self.bounds = bounds
+        # bucket lines, then the lines of the sum and the count
+        self.prefixes = prefixes
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def set_counts(self, counts, total):
+        """Take over the counts of a histogram with the same buckets kept elsewhere.
+
+        'counts' are per bucket, not cumulative, including the unbounded one.
+        """
+        self.counts[:] = counts
+        self.sum = total
+        self.count = sum(counts)
+
+    def render(self, output):
+        prefixes = self.prefixes
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            output.write(prefixes[i])
+            output.write(_format(cumulative))
+        output.write(prefixes[-2])
+        output.write(_format(self.sum))
+        output.write(prefixes[-1])
+        output.write(_format(self.count))
+
+
+class Metric(object):
+    """A metric family, with one sample per combination of label values."""
+
+    type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        documentation = documentation.replace("\\", r"\\").replace("\n", r"\n")
+        self.header = (
+            f"# HELP {name} {documentation}\n# TYPE {name} {self.type}\n"
+        ).encode()
+
+    def labels(self, *values):
+        """Return the sample for 'values' of the label names, created on first use.
+
+        Keep the returned sample to update it without the lookup.
+        """
+        child = self.children.get(values, None)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self.children[values] = self._create(values)
+        return child
+
+    def remove(self, *values):
+        self.children.pop(values, None)
+
+    def clear(self):
+        self.children.clear()
+
+    def _create(self, values):
+        return _Value(f"{self.name}{_labels(self.labelnames, values)} ".encode())
+
+    def render(self, output):
+        if not self.children:
+            return
+        output.write(self.header)
+        for child in self.children.values():
+            child.render(output)
+
+
+class Counter(Metric):
+    """A count which only goes up. Its name should end with '_total'."""
+
+    type = "counter"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    """Counts of observations up to the upper bounds 'buckets'."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=default_buckets):
+        if "le" in labelnames:
+            raise ValueError("'le' is reserved for the buckets of histograms")
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(
+            sorted(bucket for bucket in buckets if not math.isinf(bucket))
+        )
+
+    def _create(self, values):
+        names = self.labelnames + ("le",)
+        prefixes = [
+            f"{self.name}_bucket{_labels(names, values + (_format_bound(b),))} ".encode()
+            for b in self.buckets + (math.inf,)
+        ]
+        labels = _labels(self.labelnames, values)
+        prefixes.append(f"{self.name}_sum{labels} ".encode())
+        prefixes.append(f"{self.name}_count{labels} ".encode())
+        return _HistogramValue(self.buckets, prefixes)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry(object):
+    """The metrics of the app, rendered in the Prometheus text format.
+
+    Hot paths update samples in place. Values kept elsewhere anyway are copied into
+    samples by collectors, which are called before each rendering.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._output = _Output()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        metric = self.metrics.get(name, None)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+            raise ValueError(
+                f"{name} is registered already as {metric.type} with labels "
+                f"{metric.labelnames}"
+            )
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the counter 'name', registered on first use."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=default_buckets):
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def add_collector(self, callback):
+        """Call 'callback' without arguments before each rendering."""
+        if callback not in self.collectors:
+            self.collectors.append(callback)
+
+    def remove_collector(self, callback):
+        if callback in self.collectors:
+            self.collectors.remove(callback)
+
+    def set_record(self, name, record, labelnames=(), labelvalues=(), exclude=()):
+        """Set gauges from the numeric values of the nested dict 'record'.
+
+        The gauges are named by the path of the values, e.g. 'async_app_system_monitor'
+        and {"cpu_percent": 5.0} set 'async_app_system_monitor_cpu_percent'. Keys in
+        'exclude' are skipped.
+        """
+        for key, value in record.items():
+            if key in exclude:
+                continue
+            metric = f"{name}_{key}"
+            if isinstance(value, dict):
+                self.set_record(metric, value, labelnames, labelvalues, exclude)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = "".join(c if c.isalnum() or c in "_:" else "_" for c in metric)
+                self.gauge(metric, f"{key} of {name}", labelnames).labels(
+                    *labelvalues
+                ).set(value)
+
+    def render(self):
+        """Return all metrics in the Prometheus text format, as bytes."""
+        with self.render_view() as view:
+            return bytes(view)
+
+    def render_view(self):
+        """Return a memoryview of all metrics in the Prometheus text format.
+
+        Line prefixes are encoded when a sample is created and everything is written
+        into a buffer kept between calls. Apart from the numbers, nothing is allocated.
+        The view is only valid until the next rendering, release it before.
+        """
+        for collector in list(self.collectors):
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {collector!r} failed with {e!r}")
+
+        output = self._output
+        output.size = 0
+        for metric in self.metrics.values():
+            metric.render(output)
+        with memoryview(output.buffer) as view:
+            return view[: output.size]
+
+    def detach_buffer(self):
+        """Render into a new buffer from now on, e.g. if the old one is still in use."""
+        self._output = _Output(len(self._output.buffer))
+
+
+registry = Registry()
+
+_responses = {
+    200: b"200 OK",
+    404: b"404 Not Found",
+    405: b"405 Method Not Allowed",
+}
+
+
+def _header(status, length=0):
+    return (
+        b"HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+        b"Connection: close\r\n\r\n" % (_responses[status], content_type, length)
+    )
+
+
+async def serve(port, host="0.0.0.0", timeout=5.0):
+    """Serve the metrics of 'registry' at 'http://host:port/metrics'.
+
+    A minimal HTTP/1.1 server for scrapes, one request per connection. Returns once
+    the app is asked to stop.
+    """
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            method, target, _ = request.split(b"\r\n", 1)[0].split(b" ", 2)
+            if target.split(b"?", 1)[0] != b"/metrics":
+                writer.write(_header(404))
+            elif method not in (b"GET", b"HEAD"):
+                writer.write(_header(405))
+            else:
+                with registry.render_view() as body:
+                    writer.write(_header(200, len(body)))
+                    if method == b"GET":
+                        writer.write(body)
+                    # what isn't sent right away, the transport may keep a view of
+                    if writer.transport.get_write_buffer_size():
+                        registry.detach_buffer()
+            await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+            ConnectionError,
+            ValueError,
+        ) as e:
+            logger.debug(f"Metrics request failed with {e!r}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+    async with server:
+        await app_state.run_until_stopped(server.serve_forever())
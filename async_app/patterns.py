@@ -1,6 +1,5 @@
 import asyncio
-import time
-from functools import wraps
+from functools import wraps, partial
 
 from async_app.logger import logger
 import async_app.state as app_state  # to make app_state.keep_running a singleton
@@ -14,28 +13,73 @@ def frequency(frequency):
     return frequency
 
 
-def periodical(frequency=1, monitoring_cb=None):
-    """A decorator to call a function periodically"""
+overrun_policies = ("skip", "catch_up", "coalesce")
+
+
+def next_tick(tick, start, call_every, now, overrun="skip"):
+    """Find the next tick to run on the absolute grid 'start + tick * call_every'.
+
+    Returns the index of the next tick together with the number of ticks dropped
+    or coalesced according to the overrun policy:
+
+    - 'skip': drop all ticks whose deadline already passed.
+    - 'catch_up': run all missed ticks back to back.
+    - 'coalesce': run a single call for all missed ticks.
+    """
+    tick += 1
+    deadline = start + tick * call_every
+    if deadline > now or overrun == "catch_up":
+        return tick, 0, 0
+
+    missed = int((now - deadline) // call_every) + 1
+    if overrun == "coalesce":
+        return tick + missed - 1, 0, missed - 1
+    return tick + missed, missed, 0
+
+
+def periodical(
+    frequency=1, monitoring_cb=None, overrun="skip", stats=None, executor=None
+):
+    """A decorator to call a function periodically
+
+    Calls are scheduled against absolute deadlines on the loop clock, so timing errors
+    don't build up. Missed ticks are handled according to 'overrun', see next_tick.
+    If 'stats' is a dict, the number of ticks, dropped and coalesced ticks is kept there.
+    Sync functions are called on the loop, or in 'executor' if given.
+    """
 
     call_every = 1 / frequency
+    if overrun not in overrun_policies:
+        raise ValueError(f"Unknown {overrun=}. Use one of {overrun_policies}.")
+    if stats is None:
+        stats = {}
+    stats.update({"ticks": 0, "dropped": 0, "coalesced": 0})
 
     def inner_func(f):
         @wraps(f)
         async def wrapper(*args, **kwargs):
             f_is_async = True if asyncio.iscoroutinefunction(f) else False
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            tick = 0
             while app_state.keep_running:
-                tic = time.perf_counter()
                 if f_is_async:
                     await f(*args, **kwargs)
+                elif executor is not None:
+                    await loop.run_in_executor(executor, partial(f, *args, **kwargs))
                 else:
                     f(*args, **kwargs)
                 if monitoring_cb:
                     monitoring_cb()
-                toc = time.perf_counter()
+                stats["ticks"] += 1
 
-                sleep_for = max(0, call_every - (toc - tic))
+                tick, dropped, coalesced = next_tick(
+                    tick, start, call_every, loop.time(), overrun
+                )
+                stats["dropped"] += dropped
+                stats["coalesced"] += coalesced
 
-                await asyncio.sleep(sleep_for)
+                await app_state.sleep(max(0, start + tick * call_every - loop.time()))
 
         return wrapper
 
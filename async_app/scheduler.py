@@ -0,0 +1,351 @@
+import asyncio
+import heapq
+import itertools
+
+from async_app.logger import logger
+from async_app.patterns import next_tick, overrun_policies
+import async_app.state as app_state  # to make app_state.keep_running a singleton
+
+concurrency_policies = ("drop", "queue", "cancel_oldest")
+
+
+class _Entry(object):
+    """Book-keeping for a single periodic task."""
+
+    __slots__ = (
+        "uid",
+        "name",
+        "function",
+        "is_async",
+        "args",
+        "kwargs",
+        "call_every",
+        "monitoring_cb",
+        "overrun",
+        "max_concurrency",
+        "concurrency_policy",
+        "running",
+        "queued",
+        "start",
+        "tick",
+        "ticks",
+        "dropped",
+        "coalesced",
+        "cancelled",
+        "active",
+    )
+
+    def __init__(self, uid, name, function, call_every, args, kwargs):
+        self.uid = uid
+        self.name = name
+        self.function = function
+        self.is_async = asyncio.iscoroutinefunction(function)
+        self.args = args
+        self.kwargs = kwargs
+        self.call_every = call_every
+        self.monitoring_cb = None
+        self.overrun = "skip"
+        self.max_concurrency = None
+        self.concurrency_policy = "drop"
+        # running invocations in order of their start, used as an ordered set
+        self.running = {}
+        self.queued = 0
+        self.start = None
+        self.tick = 0
+        self.ticks = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.active = True
+
+    def statistics(self):
+        return {
+            "name": self.name,
+            "ticks": self.ticks,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "running": len(self.running),
+            "queued": self.queued,
+        }
+
+
+class PeriodicScheduler(object):
+    """A central scheduler for periodic tasks.
+
+    All periodic tasks share a single heap of deadlines, which is served by a single
+    asyncio task. The cost per loop iteration depends on the number of due ticks only,
+    not on the number of registered periodic tasks.
+
+    On exit, running calls get 'drain_timeout' seconds to finish before they are
+    cancelled.
+    """
+
+    def __init__(self, name="periodic_scheduler", drain_timeout=1.0):
+        self.name = name
+        self.drain_timeout = drain_timeout
+        self.entries = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._in_flight = set()
+        self._loop = None
+        self._wakeup = None
+        self._wakeup_at = None
+
+    def add(
+        self,
+        uid,
+        function,
+        frequency,
+        args=(),
+        kwargs=None,
+        name=None,
+        monitoring_cb=None,
+        overrun="skip",
+        max_concurrency=None,
+        concurrency_policy="drop",
+    ):
+        """Register a function to be called with frequency 'frequency'.
+
+        See patterns.next_tick for the available 'overrun' policies.
+
+        By default the next tick is scheduled after the current call has finished.
+        With 'max_concurrency' set, ticks of async functions are launched as independent
+        tasks instead, so a slow call doesn't lower the rate. Once 'max_concurrency'
+        calls are running, 'concurrency_policy' decides about the next tick:
+
+        - 'drop': don't call for this tick.
+        - 'queue': call as soon as a running call has finished. At most
+          'max_concurrency' ticks are queued, further ticks are dropped.
+        - 'cancel_oldest': cancel the longest running call and call again.
+        """
+        if overrun not in overrun_policies:
+            raise ValueError(f"Unknown {overrun=}. Use one of {overrun_policies}.")
+        if concurrency_policy not in concurrency_policies:
+            raise ValueError(
+                f"Unknown {concurrency_policy=}. Use one of {concurrency_policies}."
+            )
+
+        entry = _Entry(
+            uid, name or function.__name__, function, 1 / frequency, args, kwargs or {}
+        )
+        entry.monitoring_cb = monitoring_cb
+        entry.overrun = overrun
+        entry.concurrency_policy = concurrency_policy
+        if max_concurrency is not None:
+            if entry.is_async:
+                entry.max_concurrency = max(1, int(max_concurrency))
+            else:
+                logger.warning(
+                    f"Ignoring {max_concurrency=} for sync periodic task {entry.name}."
+                )
+        self.entries[uid] = entry
+
+        # Entries added to an already running scheduler are due immediately
+        if self._loop is not None:
+            self._start(entry, self._loop.time())
+
+        return entry
+
+    def remove(self, uid):
+        """Unregister the periodic task with uid 'uid'."""
+        entry = self.entries.pop(uid, None)
+        if entry is not None:
+            # stale heap items are dropped lazily when popped
+            entry.active = False
+
+    def statistics(self):
+        """Return tick statistics for all registered periodic tasks."""
+        return {uid: entry.statistics() for uid, entry in self.entries.items()}
+
+    def _start(self, entry, now):
+        entry.start = now
+        entry.tick = 0
+        self._push(now, entry)
+
+    def _push(self, deadline, entry):
+        heapq.heappush(self._heap, (deadline, next(self._sequence), entry))
+        if self._wakeup_at is not None and deadline < self._wakeup_at:
+            self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def _sleep_until(self, deadline=None):
+        self._wakeup = self._loop.create_future()
+        if deadline is None:
+            # sleep until woken up by a new entry or an exit
+            self._wakeup_at = float("inf")
+            handle = None
+        else:
+            self._wakeup_at = deadline
+            handle = self._loop.call_at(deadline, self._wake)
+        try:
+            await self._wakeup
+        finally:
+            if handle is not None:
+                handle.cancel()
+            self._wakeup = None
+            self._wakeup_at = None
+
+    def _dispatch(self, entry):
+        if entry.max_concurrency is not None:
+            self._dispatch_concurrent(entry)
+            return
+
+        if entry.is_async:
+            task = self._loop.create_task(
+                entry.function(*entry.args, **entry.kwargs), name=entry.name
+            )
+            self._in_flight.add(task)
+            task.add_done_callback(lambda task: self._on_done(entry, task))
+            return
+
+        try:
+            entry.function(*entry.args, **entry.kwargs)
+        except Exception as e:
+            self._on_failure(entry, e)
+            return
+        self._reschedule(entry)
+
+    def _on_done(self, entry, task):
+        self._in_flight.discard(task)
+        if task.cancelled():
+            # keep the statistics of calls cancelled on exit
+            if app_state.keep_running:
+                self.remove(entry.uid)
+        elif task.exception() is not None:
+            self._on_failure(entry, task.exception())
+        else:
+            self._reschedule(entry)
+
+    def _dispatch_concurrent(self, entry):
+        # the next tick doesn't depend on this call to finish
+        self._advance(entry)
+
+        if len(entry.running) >= entry.max_concurrency:
+            if entry.concurrency_policy == "drop":
+                entry.dropped += 1
+                return
+            elif entry.concurrency_policy == "queue":
+                if entry.queued < entry.max_concurrency:
+                    entry.queued += 1
+                else:
+                    entry.dropped += 1
+                return
+            else:
+                oldest = next(iter(entry.running))
+                entry.running.pop(oldest)
+                oldest.cancel()
+                entry.cancelled += 1
+
+        self._launch(entry)
+
+    def _launch(self, entry):
+        task = self._loop.create_task(
+            entry.function(*entry.args, **entry.kwargs), name=entry.name
+        )
+        self._in_flight.add(task)
+        entry.running[task] = None
+        task.add_done_callback(lambda task: self._on_run_done(entry, task))
+
+    def _on_run_done(self, entry, task):
+        self._in_flight.discard(task)
+        entry.running.pop(task, None)
+        if task.cancelled():
+            # cancelled by the 'cancel_oldest' policy or on shutdown
+            return
+        elif task.exception() is not None:
+            self._on_failure(entry, task.exception())
+            return
+
+        self._count(entry)
+        if entry.queued and entry.active and app_state.keep_running:
+            entry.queued -= 1
+            self._launch(entry)
+
+    def _on_failure(self, entry, e):
+        logger.error(
+            f"Periodic task {entry.name} failed with {e!r}. Not calling again."
+        )
+        self.remove(entry.uid)
+
+    def _count(self, entry):
+        entry.ticks += 1
+        if entry.monitoring_cb:
+            entry.monitoring_cb()
+
+    def _reschedule(self, entry):
+        self._count(entry)
+        self._advance(entry)
+
+    def _advance(self, entry):
+        if not entry.active:
+            return
+
+        entry.tick, dropped, coalesced = next_tick(
+            entry.tick, entry.start, entry.call_every, self._loop.time(), entry.overrun
+        )
+        entry.dropped += dropped
+        entry.coalesced += coalesced
+        self._push(entry.start + entry.tick * entry.call_every, entry)
+
+    async def run(self):
+        """Dispatch due periodic tasks until the app is asked to stop."""
+        self._loop = asyncio.get_running_loop()
+
+        now = self._loop.time()
+        for entry in self.entries.values():
+            self._start(entry, now)
+
+        # wake up immediately on exit
+        app_state.add_stop_callback(self._wake)
+        try:
+            await self._serve()
+        finally:
+            app_state.remove_stop_callback(self._wake)
+
+        if self._in_flight:
+            _, pending = await asyncio.wait(self._in_flight, timeout=self.drain_timeout)
+            for task in pending:
+                logger.warning(f"Cancelling periodic task {task.get_name()} on exit.")
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        self._loop = None
+
+        entries = self.entries.values()
+        return {
+            "periodicals": len(self.entries),
+            "ticks": sum(entry.ticks for entry in entries),
+            "dropped": sum(entry.dropped for entry in entries),
+            "coalesced": sum(entry.coalesced for entry in entries),
+            "cancelled": sum(entry.cancelled for entry in entries),
+        }
+
+    async def _serve(self):
+        while app_state.keep_running:
+            if not self._heap:
+                # nothing to do until new entries are added
+                await self._sleep_until()
+                continue
+
+            deadline = self._heap[0][0]
+            now = self._loop.time()
+            if deadline > now:
+                await self._sleep_until(deadline)
+                continue
+
+            # collect everything that is due and dispatch it as a batch
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+
+            for entry in due:
+                if entry.active:
+                    self._dispatch(entry)
+
+            # let other tasks run, even if the next batch is already due
+            await asyncio.sleep(0)
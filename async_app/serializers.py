@@ -0,0 +1,107 @@
+import json
+import struct
+
+# msgpack and numpy are imported on first use, to keep imports of the app fast
+
+# msgpack extension type code for numpy arrays
+NDARRAY_EXT = 1
+
+_header_length = struct.Struct("<I")
+
+
+def _is_numpy(obj):
+    # true for arrays and scalars, without importing numpy
+    return type(obj).__module__ == "numpy"
+
+
+def _default(obj):
+    if _is_numpy(obj):
+        import msgpack
+        import numpy as np
+
+        if isinstance(obj, np.ndarray):
+            return msgpack.ExtType(NDARRAY_EXT, pack_ndarray(obj))
+        if isinstance(obj, np.generic):
+            return obj.item()
+    raise TypeError(f"Can't serialize {type(obj)}")
+
+
+def pack_ndarray(array):
+    """Pack the dtype and shape of 'array' followed by its raw buffer."""
+    import msgpack
+    import numpy as np
+
+    if array.dtype.hasobject:
+        raise TypeError("Can't serialize numpy arrays of Python objects")
+    # ascontiguousarray turns 0-d arrays into 1-d ones
+    shape = array.shape
+    array = np.ascontiguousarray(array)
+    # the descriptor keeps the field names of structured dtypes
+    descr = np.lib.format.dtype_to_descr(array.dtype)
+    header = msgpack.packb([descr, shape])
+    # joining the memoryview of the array copies its buffer only once
+    return b"".join((_header_length.pack(len(header)), header, array.data.cast("B")))
+
+
+def unpack_ndarray(data):
+    """Return a read only view on the buffer in 'data', without copying it."""
+    import msgpack
+    import numpy as np
+
+    (length,) = _header_length.unpack_from(data)
+    descr, shape = msgpack.unpackb(data[4 : 4 + length])
+    dtype = np.lib.format.descr_to_dtype(_restore_descr(descr))
+    return np.frombuffer(data, dtype=dtype, offset=4 + length).reshape(tuple(shape))
+
+
+def _restore_descr(descr):
+    # msgpack turns the field tuples of structured dtypes into lists
+    if not isinstance(descr, list):
+        return descr
+    fields = []
+    for name, format, *shape in descr:
+        name = tuple(name) if isinstance(name, list) else name
+        fields.append((name, _restore_descr(format), *(tuple(s) for s in shape)))
+    return fields
+
+
+def _ext_hook(code, data):
+    import msgpack
+
+    if code == NDARRAY_EXT:
+        return unpack_ndarray(data)
+    return msgpack.ExtType(code, data)
+
+
+def msgpack_packer(data):
+    import msgpack
+
+    return msgpack.packb(data, default=_default)
+
+
+def msgpack_unpacker(data):
+    import msgpack
+
+    return msgpack.unpackb(data, ext_hook=_ext_hook)
+
+
+def _json_default(obj):
+    # numpy arrays become lists, use msgpack to keep them as arrays
+    if _is_numpy(obj):
+        return obj.tolist()
+    raise TypeError(f"Can't serialize {type(obj)}")
+
+
+def json_packer(data):
+    return json.dumps(data, default=_json_default)
+
+
+def json_unpacker(data):
+    return json.loads(data)
+
+
+# packer and unpacker by serializer name
+serializers = {
+    "msgpack": (msgpack_packer, msgpack_unpacker),
+    "json": (json_packer, json_unpacker),
+}
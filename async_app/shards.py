@@ -0,0 +1,76 @@
+import zlib
+
+from async_app.logger import logger
+
+sharding_strategies = ("weight", "hash")
+
+
+def _groups(task_descriptions):
+    """Group task descriptions connected by 'provides' and 'depends_on'.
+
+    Tasks depending on each other have to end up in the same shard.
+    """
+    parents = list(range(len(task_descriptions)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    providers = {
+        task_description["provides"]: index
+        for index, task_description in enumerate(task_descriptions)
+        if "provides" in task_description
+    }
+    for index, task_description in enumerate(task_descriptions):
+        for resource in task_description.get("depends_on", ()):
+            if resource in providers:
+                parents[find(index)] = find(providers[resource])
+
+    groups = {}
+    for index, task_description in enumerate(task_descriptions):
+        groups.setdefault(find(index), []).append(task_description)
+    return list(groups.values())
+
+
+def _shard_key(group):
+    task_description = group[0]
+    if "shard_key" in task_description:
+        return str(task_description["shard_key"])
+    return f"{task_description['name']}:{task_description.get('args', ())!r}"
+
+
+def partition(task_descriptions, workers, strategy="weight"):
+    """Distribute task descriptions over 'workers' shards.
+
+    With strategy 'weight', task descriptions are assigned greedily to the least loaded
+    shard, heaviest first. The load of a task is its 'weight', defaulting to 1.
+    With strategy 'hash', the shard is derived from a stable hash of the
+    'shard_key' of a task, defaulting to its name and args.
+    """
+    if strategy not in sharding_strategies:
+        raise ValueError(f"Unknown {strategy=}. Use one of {sharding_strategies}.")
+
+    shards = [[] for _ in range(workers)]
+    groups = _groups(task_descriptions)
+
+    if strategy == "hash":
+        for group in groups:
+            shard = zlib.crc32(_shard_key(group).encode()) % workers
+            shards[shard].extend(group)
+    else:
+        loads = [0] * workers
+
+        def weight(group):
+            return sum(task_description.get("weight", 1) for task_description in group)
+
+        for group in sorted(groups, key=weight, reverse=True):
+            shard = loads.index(min(loads))
+            shards[shard].extend(group)
+            loads[shard] += weight(group)
+
+    for shard, shard_descriptions in enumerate(shards):
+        logger.debug(f"Shard {shard} got {len(shard_descriptions)} tasks")
+
+    return shards
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import sys
+import struct
+from multiprocessing import shared_memory
+
+from async_app.logger import logger
+import async_app.messenger as app_messenger
+
+# the ring buffer of a namespace, see publish
+slots = int(os.environ.get("ASYNC_APP_SHM_SLOTS", 16))
+slot_size = int(os.environ.get("ASYNC_APP_SHM_SLOT_SIZE", 2**20))
+# listeners copy payloads the writer is about to overwrite, see listener
+copy_margin = int(os.environ.get("ASYNC_APP_SHM_COPY_MARGIN", 4))
+
+# number of slots, slot size and number of writes at the start of the segment
+_layout = struct.Struct("<QQQ")
+# sequence number and payload length at the start of each slot
+_slot_header = struct.Struct("<QQ")
+
+
+class SharedRingBuffer(object):
+    """A ring buffer of 'slots' payloads of up to 'slot_size' bytes in shared memory.
+
+    There is a single writer, which creates the buffer, and any number of readers in
+    other processes, attached by 'name'. Nothing is locked. The writer overwrites the
+    oldest slot, readers detect that by the sequence number of the slot. It is odd
+    while the slot is written and twice the number of the write afterwards.
+    """
+
+    def __init__(self, name, slots=16, slot_size=2**20, create=False):
+        self.name = name
+        self.create = create
+        if create:
+            size = _layout.size + slots * (_slot_header.size + slot_size)
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            _layout.pack_into(self.shm.buf, 0, slots, slot_size, 0)
+        else:
+            self.shm = _attach(name)
+            slots, slot_size, _ = _layout.unpack_from(self.shm.buf, 0)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.writes = 0
+
+    def _offset(self, slot):
+        return _layout.size + slot * (_slot_header.size + self.slot_size)
+
+    def write(self, data):
+        """Copy the bytes-like 'data' into the next slot and return its descriptor."""
+        view = memoryview(data).cast("B")
+        length = view.nbytes
+        if length > self.slot_size:
+            raise ValueError(f"{length} bytes don't fit into slots of {self.slot_size}")
+
+        self.writes += 1
+        slot = (self.writes - 1) % self.slots
+        offset = self._offset(slot)
+        buf = self.shm.buf
+        _slot_header.pack_into(buf, offset, 2 * self.writes - 1, 0)
+        start = offset + _slot_header.size
+        buf[start : start + length] = view
+        _slot_header.pack_into(buf, offset, 2 * self.writes, length)
+        _layout.pack_into(buf, 0, self.slots, self.slot_size, self.writes)
+
+        return {
+            "name": self.name,
+            "slot": slot,
+            "sequence": 2 * self.writes,
+            "length": length,
+        }
+
+    def is_current(self, descriptor):
+        """Return whether the slot of 'descriptor' still holds its payload."""
+        sequence, _ = _slot_header.unpack_from(
+            self.shm.buf, self._offset(descriptor["slot"])
+        )
+        return sequence == descriptor["sequence"]
+
+    def headroom(self, descriptor):
+        """Return the number of writes until the slot of 'descriptor' is overwritten."""
+        _, _, writes = _layout.unpack_from(self.shm.buf, 0)
+        return self.slots - (writes - descriptor["sequence"] // 2)
+
+    def view(self, descriptor):
+        """Return a memoryview of the payload of 'descriptor', None if overwritten.
+
+        The view is only valid until the writer wraps around to the slot again, check
+        with is_current after using it. Release it before closing the buffer.
+        """
+        if not self.is_current(descriptor):
+            return None
+        start = self._offset(descriptor["slot"]) + _slot_header.size
+        return self.shm.buf[start : start + descriptor["length"]]
+
+    def close(self):
+        self.shm.close()
+        if self.create:
+            self.shm.unlink()
+
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    # before Python 3.13 the resource tracker unlinks segments of readers on exit
+    from multiprocessing import resource_tracker
+
+    shm = shared_memory.SharedMemory(name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+_writers = {}
+_readers = {}
+statistics = {"published": 0, "received": 0, "copied": 0, "overwritten": 0}
+
+
+def _segment_name():
+    # namespaces may be too long or contain slashes, which segment names can't
+    return f"async_app_{os.getpid()}_{len(_writers)}"
+
+
+async def publish(namespace, data):
+    """Publish the bytes-like 'data' to 'namespace' through shared memory.
+
+    Only a small descriptor goes through the messenger. The ring buffer of the
+    namespace is created on first use with ASYNC_APP_SHM_SLOTS slots of
+    ASYNC_APP_SHM_SLOT_SIZE bytes. Listeners must run on the same host.
+    """
+    ring = _writers.get(namespace, None)
+    if ring is None:
+        ring = _writers[namespace] = SharedRingBuffer(
+            _segment_name(), slots, slot_size, create=True
+        )
+    descriptor = ring.write(data)
+    statistics["published"] += 1
+    await app_messenger.publish(namespace, descriptor)
+
+
+async def listener(namespace, callback, **kwargs):
+    """Call 'callback' with a memoryview of every payload published to 'namespace'.
+
+    The memoryview is only valid during the call, copy what is needed later. When the
+    writer is within ASYNC_APP_SHM_COPY_MARGIN writes of overwriting a payload, it is
+    copied and checked first and 'callback' gets the bytes instead. Payloads
+    overwritten before they could be delivered are skipped and counted. A view
+    overwritten while 'callback' still uses it is counted and logged, it can't be
+    taken back. Other keyword arguments are passed on to messenger.listener.
+    """
+
+    async def on_descriptor(descriptor):
+        ring = _readers.get(descriptor["name"], None)
+        if ring is None:
+            ring = _readers[descriptor["name"]] = SharedRingBuffer(descriptor["name"])
+
+        view = ring.view(descriptor)
+        if view is None:
+            statistics["overwritten"] += 1
+            return
+        if ring.headroom(descriptor) <= copy_margin:
+            # a seqlock read: the copy is intact if the slot wasn't touched meanwhile
+            with view:
+                payload = bytes(view)
+            if not ring.is_current(descriptor):
+                statistics["overwritten"] += 1
+                return
+            statistics["copied"] += 1
+            await _call(callback, payload)
+            statistics["received"] += 1
+            return
+
+        try:
+            await _call(callback, view)
+        finally:
+            view.release()
+        if not ring.is_current(descriptor):
+            statistics["overwritten"] += 1
+            logger.warning(f"Payload of {namespace} was overwritten while in use.")
+        else:
+            statistics["received"] += 1
+
+    await app_messenger.listener(namespace, on_descriptor, **kwargs)
+
+
+async def _call(callback, payload):
+    if asyncio.iscoroutinefunction(callback):
+        await callback(payload)
+    else:
+        callback(payload)
+
+
+def close():
+    """Detach from all ring buffers and remove the ones written by this process."""
+    for ring in list(_writers.values()) + list(_readers.values()):
+        ring.close()
+    _writers.clear()
+    _readers.clear()
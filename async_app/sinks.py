@@ -0,0 +1,136 @@
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from async_app.logger import logger
+
+result_sinks = ("ring", "jsonl", "none")
+
+
+class ResultSummary(object):
+    """Counts of finished tasks per state in constant memory."""
+
+    def __init__(self):
+        self.counts = {"done": 0, "failed": 0, "cancelled": 0}
+
+    def add(self, record):
+        self.counts[record["state"]] += 1
+
+    def as_dict(self):
+        return {"total": sum(self.counts.values()), **self.counts}
+
+
+class RingBufferSink(object):
+    """Keep the records of the last 'maxlen' finished tasks."""
+
+    def __init__(self, maxlen=1000):
+        self.records = deque(maxlen=maxlen)
+
+    def add(self, record):
+        self.records.append(record)
+
+    def results(self):
+        return list(self.records)
+
+    def close(self):
+        pass
+
+
+class JSONLinesSink(object):
+    """Append the records of finished tasks to a JSON lines file.
+
+    Records are collected for 'flush_interval' seconds and then serialized and
+    written by a thread, keeping file I/O off the event loop. Results must not be
+    modified once their task is done.
+    """
+
+    def __init__(self, path, flush_interval=0.1):
+        self.path = Path(path)
+        self.fd = self.path.open("a")
+        self.flush_interval = flush_interval
+        self.pending = []
+        self._handle = None
+        # a single thread keeps the batches in order
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="jsonl_sink")
+
+    def add(self, record):
+        self.pending.append(record)
+        if self._handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Hand the pending records to the writer thread."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self.pending:
+            self._writer.submit(self._write, self.pending)
+            self.pending = []
+
+    def _write(self, records):
+        # results may be arbitrary objects, like resources provided by init tasks
+        try:
+            self.fd.writelines(
+                json.dumps(record, default=repr) + "\n" for record in records
+            )
+            self.fd.flush()
+        except Exception as e:
+            logger.error(f"Writing results to {self.path} failed with {e!r}")
+
+    def results(self):
+        return []
+
+    def close(self):
+        """Write the pending records and wait for the writer thread."""
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self.fd.close()
+
+
+class CallbackSink(object):
+    """Hand the records of finished tasks to 'callback'."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def add(self, record):
+        try:
+            self.callback(record)
+        except Exception as e:
+            logger.error(f"Result callback failed with {e!r}")
+
+    def results(self):
+        return []
+
+    def close(self):
+        pass
+
+
+def create_sink(result_sink="ring", result_buffer_size=1000, result_file=None):
+    """Create a result sink from app options.
+
+    'result_sink' is one of 'ring', 'jsonl' and 'none', a callable or an object with
+    'add', 'results' and 'close' methods.
+    """
+    if callable(result_sink):
+        return CallbackSink(result_sink)
+    if not isinstance(result_sink, str):
+        return result_sink
+
+    if result_sink == "jsonl":
+        if result_file is None:
+            raise ValueError("A 'result_file' is needed for the 'jsonl' result sink.")
+        return JSONLinesSink(result_file)
+    elif result_sink == "none":
+        return CallbackSink(lambda record: None)
+    elif result_sink == "ring":
+        return RingBufferSink(result_buffer_size)
+
+    raise ValueError(f"Unknown {result_sink=}. Use one of {result_sinks}.")
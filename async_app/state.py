@@ -1 +1,91 @@
+import asyncio
+
 keep_running = True
+
+# the event is bound to the loop it was created for
+_stopped = None
+_stopped_loop = None
+_stop_callbacks = []
+
+
+def stopped_event():
+    """Return an asyncio.Event, which is set once the app is asked to stop."""
+    global _stopped, _stopped_loop
+
+    loop = asyncio.get_running_loop()
+    if _stopped is None or _stopped_loop is not loop:
+        _stopped = asyncio.Event()
+        _stopped_loop = loop
+    if not keep_running:
+        _stopped.set()
+    return _stopped
+
+
+def stop():
+    """Ask the app to stop and wake up everything waiting for it.
+
+    Setting 'keep_running' to False directly still works, but waiters only notice
+    when they wake up on their own.
+    """
+    global keep_running
+
+    keep_running = False
+    if _stopped is not None:
+        _stopped.set()
+    for callback in list(_stop_callbacks):
+        callback()
+
+
+def reset():
+    """Allow the app to run again after a stop."""
+    global keep_running, _stopped, _stopped_loop
+
+    keep_running = True
+    _stopped = None
+    _stopped_loop = None
+
+
+def add_stop_callback(callback):
+    """Call 'callback' without arguments when the app is asked to stop."""
+    _stop_callbacks.append(callback)
+
+
+def remove_stop_callback(callback):
+    if callback in _stop_callbacks:
+        _stop_callbacks.remove(callback)
+
+
+async def sleep(delay):
+    """Sleep for 'delay' seconds, but wake up as soon as the app is asked to stop.
+
+    Returns whether the app should keep running.
+    """
+    if not keep_running:
+        return False
+
+    try:
+        await asyncio.wait_for(stopped_event().wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+    return keep_running
+
+
+async def wait_stopped():
+    """Wait until the app is asked to stop."""
+    await stopped_event().wait()
+
+
+async def run_until_stopped(aw):
+    """Await 'aw', but cancel it as soon as the app is asked to stop."""
+    task = asyncio.ensure_future(aw)
+    stopped = asyncio.ensure_future(wait_stopped())
+    try:
+        await asyncio.wait((task, stopped), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    if not task.cancelled():
+        return task.result()
@@ -0,0 +1,113 @@
+import math
+
+
+class LogHistogram(object):
+    """A histogram with logarithmic buckets for quantiles of positive values.
+
+    Quantiles are accurate to within 'accuracy', relative to the value. Values below
+    'minimum' share the first bucket. Memory only grows with the range of the values,
+    not their number. Histograms with the same settings can be merged.
+    """
+
+    def __init__(self, accuracy=0.01, minimum=1e-6):
+        self.accuracy = accuracy
+        self.minimum = minimum
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = 0
+        if value > self.minimum:
+            index = math.ceil(math.log(value / self.minimum) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the counts of 'other', a histogram with the same settings."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Return the value below which a fraction 'q' of the values lie."""
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs):
+        """Return the values for the ascending fractions 'qs', sorting only once."""
+        if not self.count:
+            return [None] * len(qs)
+
+        indexes = iter(sorted(self.buckets))
+        seen = 0
+        values = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            while seen <= rank:
+                index = next(indexes)
+                seen += self.buckets[index]
+            values.append(self._value(index))
+        return values
+
+    def _value(self, index):
+        if index == 0:
+            return self.minimum
+        # the middle of the bucket, within 'accuracy' of all values in it
+        value = 2 * self.minimum * self.gamma**index / (self.gamma + 1)
+        return min(value, self.max)
+
+
+class TaskStatistics(object):
+    """Call count, call rate and call durations of a task, in constant memory.
+
+    The rate is an exponentially weighted moving average, with a time constant of
+    'tau' seconds.
+    """
+
+    def __init__(self, tau=10.0):
+        self.tau = tau
+        self.count = 0
+        self.failed = 0
+        self.rate = None
+        self.last_start = None
+        self.durations = LogHistogram()
+
+    def observe(self, start, duration, failed=False):
+        """Record a call started at 'start' taking 'duration' seconds."""
+        if self.last_start is not None:
+            interval = start - self.last_start
+            if interval > 0:
+                if self.rate is None:
+                    self.rate = 1 / interval
+                else:
+                    alpha = 1 - math.exp(-interval / self.tau)
+                    self.rate += alpha * (1 / interval - self.rate)
+        self.last_start = start
+        self.count += 1
+        if failed:
+            self.failed += 1
+        self.durations.add(duration)
+
+    def snapshot(self):
+        durations = self.durations
+        p50, p90, p99 = durations.quantiles((0.5, 0.9, 0.99))
+        return {
+            "count": self.count,
+            "failed": self.failed,
+            "rate": self.rate,
+            "duration": {
+                "mean": durations.sum / durations.count if durations.count else None,
+                "p50": p50,
+                "p90": p90,
+                "p99": p99,
+                "max": durations.max,
+            },
+        }
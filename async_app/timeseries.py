@@ -0,0 +1,254 @@
+import asyncio
+import os
+import time
+import uuid
+
+from async_app.logger import logger
+import async_app.messenger as app_messenger
+
+# seconds per bucket and number of buckets kept, for each resolution
+resolutions = {"1s": (1, 3600), "1min": (60, 1440), "1h": (3600, 720)}
+aggregates = ("mean", "min", "max", "sum", "count", "last")
+
+# raw samples kept per metric and number of metrics of the store, see TimeSeriesStore
+capacity = int(os.environ.get("ASYNC_APP_TIMESERIES_CAPACITY", 3600))
+max_metrics = int(os.environ.get("ASYNC_APP_TIMESERIES_MAX_METRICS", 1000))
+
+
+class RingBuffer(object):
+    """The last 'capacity' rows of 'columns' float columns, in a numpy array.
+
+    The array starts small and doubles until it holds 'capacity' rows, so metrics
+    sampled rarely or only for a while don't take the full size.
+    """
+
+    initial_size = 16
+
+    def __init__(self, capacity, columns):
+        self.data = None
+        self.capacity = capacity
+        self.columns = columns
+        self.next = 0
+        self.count = 0
+
+    def append(self, row):
+        import numpy as np
+
+        if self.data is None:
+            self.data = np.empty((min(self.initial_size, self.capacity), self.columns))
+        elif self.count == len(self.data) < self.capacity:
+            # not wrapped yet, the rows are in order
+            size = min(2 * len(self.data), self.capacity)
+            self.data = np.concatenate(
+                (self.data, np.empty((size - len(self.data), self.columns)))
+            )
+            self.next = self.count
+        self.data[self.next] = row
+        self.next = (self.next + 1) % len(self.data)
+        self.count = min(self.count + 1, self.capacity)
+
+    def rows(self):
+        """Return the rows oldest first, as a copy."""
+        import numpy as np
+
+        if self.count < self.capacity:
+            if self.data is None:
+                return np.empty((0, self.columns))
+            return self.data[: self.count].copy()
+        return np.concatenate((self.data[self.next :], self.data[: self.next]))
+
+
+class Series(object):
+    """Samples of one metric at full resolution and rolled up into buckets.
+
+    Raw rows are (time, value). Rolled up rows are (bucket start, count, sum, min,
+    max, last).
+    """
+
+    def __init__(self, capacity=3600, resolutions=resolutions):
+        self.resolutions = resolutions
+        self.raw = RingBuffer(capacity, 2)
+        self.rollups = {
+            resolution: RingBuffer(buckets, 6)
+            for resolution, (_, buckets) in resolutions.items()
+        }
+        # the bucket still filling up, per resolution
+        self.open = {}
+
+    def add(self, t, value):
+        self.raw.append((t, value))
+        for resolution, (seconds, _) in self.resolutions.items():
+            start = t - t % seconds
+            bucket = self.open.get(resolution, None)
+            if bucket is not None and bucket[0] != start:
+                self.rollups[resolution].append(bucket)
+                bucket = None
+            if bucket is None:
+                self.open[resolution] = [start, 1, value, value, value, value]
+            else:
+                bucket[1] += 1
+                bucket[2] += value
+                bucket[3] = min(bucket[3], value)
+                bucket[4] = max(bucket[4], value)
+                bucket[5] = value
+
+    def rows(self, resolution="raw"):
+        """Return the rows of 'resolution', including the open bucket."""
+        import numpy as np
+
+        if resolution == "raw":
+            return self.raw.rows()
+        rows = self.rollups[resolution].rows()
+        bucket = self.open.get(resolution, None)
+        if bucket is not None:
+            rows = np.vstack((rows, bucket))
+        return rows
+
+
+class TimeSeriesStore(object):
+    """In process history of numeric monitor records.
+
+    Each numeric leaf of a record becomes a metric named by its path, e.g.
+    'async_app:system_monitor.cpu_percent'. At most 'max_metrics' metrics are kept,
+    each with up to 'capacity' raw samples and the buckets of 'resolutions'. The
+    defaults are taken from ASYNC_APP_TIMESERIES_CAPACITY and
+    ASYNC_APP_TIMESERIES_MAX_METRICS.
+    """
+
+    def __init__(
+        self, capacity=capacity, max_metrics=max_metrics, resolutions=resolutions
+    ):
+        self.capacity = capacity
+        self.max_metrics = max_metrics
+        self.resolutions = resolutions
+        self.series = {}
+        self.dropped = 0
+
+    def add(self, metric, value, t=None):
+        series = self.series.get(metric, None)
+        if series is None:
+            if len(self.series) >= self.max_metrics:
+                if not self.dropped:
+                    logger.warning(f"More than {self.max_metrics} metrics. Dropping.")
+                self.dropped += 1
+                return
+            series = self.series[metric] = Series(self.capacity, self.resolutions)
+        series.add(time.time() if t is None else t, value)
+
+    def add_record(self, prefix, record, t=None, exclude=()):
+        """Add all numeric values of the nested dict 'record'.
+
+        Keys in 'exclude' are skipped, e.g. ids which are numbers but no metrics.
+        """
+        t = time.time() if t is None else t
+        for key, value in record.items():
+            if key in exclude:
+                continue
+            metric = f"{prefix}.{key}"
+            if isinstance(value, dict):
+                self.add_record(metric, value, t, exclude)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.add(metric, value, t)
+
+    def metrics(self):
+        return sorted(self.series)
+
+    def query(self, metric, start=None, end=None, resolution="raw", aggregate=None):
+        """Return the samples of 'metric' between 'start' and 'end'.
+
+        Without 'aggregate', the result holds the times and values, for rolled up
+        resolutions the mean, min and max values of the buckets. With 'aggregate',
+        one of 'mean', 'min', 'max', 'sum', 'count' and 'last', a single value over
+        the range is returned.
+        """
+        import numpy as np
+
+        if resolution != "raw" and resolution not in self.resolutions:
+            raise ValueError(
+                f"Unknown {resolution=}. Use 'raw' or one of {list(self.resolutions)}."
+            )
+        if aggregate is not None and aggregate not in aggregates:
+            raise ValueError(f"Unknown {aggregate=}. Use one of {aggregates}.")
+
+        series = self.series.get(metric, None)
+        rows = series.rows(resolution) if series is not None else np.empty((0, 6))
+        times = rows[:, 0]
+        selected = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            selected &= times >= start
+        if end is not None:
+            selected &= times <= end
+        rows = rows[selected]
+
+        if resolution == "raw":
+            count, total = np.ones(len(rows)), rows[:, 1]
+            minimum = maximum = last = rows[:, 1]
+        else:
+            count, total, minimum, maximum, last = rows[:, 1:6].T
+
+        if aggregate is None:
+            if resolution == "raw":
+                return {"times": rows[:, 0], "values": rows[:, 1]}
+            return {
+                "times": rows[:, 0],
+                "mean": total / count,
+                "min": minimum,
+                "max": maximum,
+            }
+
+        if not len(rows):
+            return None
+        return {
+            "mean": lambda: total.sum() / count.sum(),
+            "min": minimum.min,
+            "max": maximum.max,
+            "sum": total.sum,
+            "count": count.sum,
+            "last": lambda: last[-1],
+        }[aggregate]().item()
+
+
+store = TimeSeriesStore()
+
+
+async def serve_queries(namespace):
+    """Answer queries published to 'namespace' until the app is asked to stop.
+
+    A query is a dict of the arguments of TimeSeriesStore.query, or 'metrics' set to
+    True for the list of metrics, and a 'reply_to' namespace for the answer.
+    """
+
+    async def answer(request):
+        reply_to = request.pop("reply_to")
+        try:
+            if request.pop("metrics", False):
+                response = {"result": store.metrics()}
+            else:
+                response = {"result": store.query(**request)}
+        except (TypeError, ValueError) as e:
+            response = {"error": str(e)}
+        await app_messenger.publish(reply_to, response)
+
+    await app_messenger.listener(namespace, answer)
+
+
+async def query(namespace, timeout=1.0, **request):
+    """Send a query to the store served at 'namespace', see serve_queries."""
+    reply_to = f"{namespace}:reply:{uuid.uuid4()}"
+    reply = asyncio.get_running_loop().create_future()
+
+    def on_reply(response):
+        if not reply.done():
+            reply.set_result(response)
+
+    backend = app_messenger.get_backend()
+    await backend.subscribe(reply_to, on_reply)
+    try:
+        await app_messenger.publish(namespace, {**request, "reply_to": reply_to})
+        response = await asyncio.wait_for(reply, timeout)
+    finally:
+        await backend.unsubscribe(reply_to, on_reply)
+
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
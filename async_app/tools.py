@@ -5,13 +5,11 @@ import time
 import json
 from pathlib import Path
 
-import psutil
-import redis.asyncio as redis
-
 from async_app.logger import logger
 import async_app.state as app_state  # for keep_running to be singleton
 import async_app.messenger as app_messenger
-
+import async_app.metrics as app_metrics
+import async_app.timeseries as app_timeseries
 
 app_name = Path(sys.argv[0]).stem
 app_env_prefix = app_name.upper()
@@ -29,45 +27,96 @@ if log_indent:
         )
 
 
+# psutil.Process objects by monitor and pid. Their cpu_percent is the usage since
+# the previous call on the same object, without sleeping in between. Each monitor
+# has its own objects, so their calls don't reset each other's baseline.
+_processes = {"process_monitor": {}, "cpu_monitor": {}}
+
+
+def _process(monitor, pid=None):
+    import psutil
+
+    processes = _processes[monitor]
+    pid = pid or os.getpid()
+    process = processes.get(pid, None)
+    if process is None or not process.is_running():
+        process = processes[pid] = psutil.Process(pid)
+    return process
+
+
+def _sample_process(attrs):
+    process = _process("process_monitor")
+    with process.oneshot():
+        return process.as_dict(attrs=attrs)
+
+
 async def process_monitor(
     attrs=["pid", "cpu_percent", "memory_percent", "num_fds", "num_threads"],
 ):
-    # It's totally fine to have this blocking
-    # In an Intel iMac 2019 this call just takes 10 ns.
-    # Although for the same reason, it might not provide the results expected in an async environment
+    # psutil calls may block, e.g. on a busy /proc, keep them off the loop
+    record = await asyncio.to_thread(_sample_process, attrs)
 
-    p = psutil.Process()
-    with p.oneshot():
-        record = p.as_dict(attrs=attrs)
-
-    await app_messenger.publish("async_app:app_monitor", record)
-    await app_messenger.set("async_app:app_monitor", record)
+    await app_messenger.publish_and_set("async_app:app_monitor", record)
+    app_timeseries.store.add_record("async_app:app_monitor", record, exclude=("pid",))
+    app_metrics.registry.set_record("async_app_process", record, exclude=("pid",))
 
     logger.debug(json.dumps(record, indent=log_indent))
 
     return record
 
 
+def _sample_cpu():
+    import psutil
+
+    process = _process("cpu_monitor")
+    record = {process.name(): process.cpu_percent()}
+    pids = {process.pid}
+    for child in process.children():
+        try:
+            child = _process("cpu_monitor", child.pid)
+            record[child.name()] = child.cpu_percent()
+            pids.add(child.pid)
+        except psutil.NoSuchProcess:
+            continue
+    # forget children which are gone
+    processes = _processes["cpu_monitor"]
+    for pid in list(processes):
+        if pid not in pids:
+            del processes[pid]
+    return record
+
+
 async def cpu_monitor():
-    record = {}
-    p = psutil.Process()
-    record[p.name()] = p.cpu_percent(0.1)
-    for c in p.children():
-        record[c.name()] = c.cpu_percent(0.1)
+    """CPU usage of the app and its children since the previous call.
+
+    The first call reports 0.0 for every process.
+    """
+    record = await asyncio.to_thread(_sample_cpu)
 
     logger.debug(json.dumps(record, indent=log_indent))
 
+    return record
+
+
+def _sample_system(disk_usage_path):
+    import psutil
 
-async def system_monitor(disk_usage_path="/"):
     mem_info = psutil.virtual_memory()
     disk_usage = psutil.disk_usage(disk_usage_path)
-    record = {
+    return {
+        # usage since the previous call
         "cpu_percent": psutil.cpu_percent(),
         "mem_percent": mem_info.percent,
         "disk_percent": disk_usage.percent,
     }
+
+
+async def system_monitor(disk_usage_path="/"):
+    # disk usage may block for long on slow or network mounts, keep it off the loop
+    record = await asyncio.to_thread(_sample_system, disk_usage_path)
     logger.debug(json.dumps(record, indent=log_indent))
-    await app_messenger.publish("async_app:system_monitor", record)
-    await app_messenger.set("async_app:system_monitor", record)
+    await app_messenger.publish_and_set("async_app:system_monitor", record)
+    app_timeseries.store.add_record("async_app:system_monitor", record)
+    app_metrics.registry.set_record("async_app_system", record)
 
     return record
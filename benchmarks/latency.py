@@ -0,0 +1,65 @@
+"""Measure the latency of the messenger from publish to callback.
+
+Usage: python benchmarks/latency.py [count] [interval]
+
+Publishes 'count' messages, 'interval' seconds apart, and reports the p50 and p99
+latency until the listener callback sees them, for each messenger backend. The redis
+backend needs a running redis-server.
+"""
+
+import sys
+import time
+import asyncio
+import statistics
+
+import async_app.state as app_state
+import async_app.messenger as app_messenger
+
+
+async def latencies(count, interval, namespace="async_app:benchmark:latency"):
+    samples = []
+    received = asyncio.Event()
+
+    def callback(data):
+        samples.append(time.perf_counter() - data)
+        if len(samples) == count:
+            received.set()
+
+    listener = asyncio.create_task(app_messenger.listener(namespace, callback))
+    try:
+        # give the listener some time to subscribe
+        await asyncio.sleep(0.5)
+        if listener.done():
+            listener.result()
+
+        for _ in range(count):
+            await app_messenger.publish(namespace, time.perf_counter())
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(received.wait(), 5)
+    finally:
+        app_state.stop()
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    return samples
+
+
+def main(count=1000, interval=0.001):
+    for backend in app_messenger.backends:
+        app_messenger.set_backend(backend)
+        app_state.reset()
+        try:
+            samples = asyncio.run(latencies(int(count), interval))
+        except Exception as e:
+            print(f"{backend:>6}: skipped ({e!r})")
+            continue
+
+        percentiles = statistics.quantiles(samples, n=100)
+        print(
+            f"{backend:>6}: {len(samples)} messages, "
+            f"p50 {1e3 * percentiles[49]:.3f} ms, p99 {1e3 * percentiles[98]:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:]))
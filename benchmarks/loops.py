@@ -0,0 +1,91 @@
+"""Compare event loop implementations for periodicals and messenger round trips.
+
+Usage: python benchmarks/loops.py [duration]
+
+Messenger round trips need a running redis-server and are skipped otherwise.
+"""
+
+import sys
+import time
+import asyncio
+
+import async_app.state as app_state
+import async_app.loops as app_loops
+import async_app.messenger as app_messenger
+from async_app.scheduler import PeriodicScheduler
+
+ticks = 0
+
+
+async def tick():
+    global ticks
+    ticks += 1
+
+
+async def periodicals(duration, count=1000, frequency=100):
+    scheduler = PeriodicScheduler()
+    for uid in range(count):
+        scheduler.add(uid, tick, frequency)
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(duration)
+    app_state.stop()
+    await task
+
+
+async def round_trips(count=1000, namespace="async_app:benchmark:loops"):
+    loop = asyncio.get_running_loop()
+    received = None
+
+    def callback(data):
+        if not received.done():
+            received.set_result(data)
+
+    listener = asyncio.create_task(app_messenger.listener(namespace, callback))
+    try:
+        # give the listener some time to subscribe
+        await asyncio.sleep(0.5)
+        if listener.done():
+            listener.result()
+
+        tic = time.perf_counter()
+        for i in range(count):
+            received = loop.create_future()
+            await app_messenger.publish(namespace, i)
+            await asyncio.wait_for(received, 1)
+        toc = time.perf_counter()
+    finally:
+        app_state.stop()
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    return count / (toc - tic)
+
+
+def main(duration=2):
+    for event_loop in ("asyncio", "uvloop"):
+        factory = app_loops.loop_factory(event_loop)
+        if event_loop == "uvloop" and factory is asyncio.new_event_loop:
+            print(f"{event_loop:>8}: not installed")
+            continue
+
+        global ticks
+        ticks = 0
+        app_state.reset()
+        cpu_tic = time.process_time()
+        app_loops.run(periodicals(duration), event_loop)
+        cpu = time.process_time() - cpu_tic
+        print(
+            f"{event_loop:>8}: {ticks / duration:10.1f} periodical ticks/s, "
+            f"{1e6 * cpu / ticks:6.2f} us cpu per tick"
+        )
+
+        app_state.reset()
+        try:
+            rate = app_loops.run(round_trips(), event_loop)
+            print(f"{event_loop:>8}: {rate:10.1f} messenger round trips/s")
+        except Exception as e:
+            print(f"{event_loop:>8}: messenger round trips skipped ({e!r})")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:]))
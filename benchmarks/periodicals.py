@@ -0,0 +1,66 @@
+"""Compare one asyncio task per periodical against the central PeriodicScheduler.
+
+Usage: python benchmarks/periodicals.py [count] [frequency] [duration]
+"""
+
+import sys
+import time
+import asyncio
+
+import async_app.state as app_state
+from async_app.patterns import periodical
+from async_app.scheduler import PeriodicScheduler
+
+ticks = 0
+
+
+def tick():
+    global ticks
+    ticks += 1
+
+
+async def stop_after(duration):
+    await asyncio.sleep(duration)
+    app_state.stop()
+
+
+async def run_tasks(count, frequency, duration):
+    tasks = [asyncio.create_task(periodical(frequency)(tick)()) for _ in range(count)]
+    await stop_after(duration)
+    await asyncio.gather(*tasks)
+
+
+async def run_scheduler(count, frequency, duration):
+    scheduler = PeriodicScheduler()
+    for uid in range(count):
+        scheduler.add(uid, tick, frequency)
+    task = asyncio.create_task(scheduler.run())
+    await stop_after(duration)
+    await task
+
+
+def measure(label, coro_function, count, frequency, duration):
+    global ticks
+    ticks = 0
+    app_state.reset()
+
+    wall_tic = time.perf_counter()
+    cpu_tic = time.process_time()
+    asyncio.run(coro_function(count, frequency, duration))
+    cpu = time.process_time() - cpu_tic
+    wall = time.perf_counter() - wall_tic
+
+    print(
+        f"{label:>12}: {ticks:>8} ticks in {wall:6.2f} s wall, {cpu:6.2f} s cpu, "
+        f"{1e6 * cpu / max(ticks, 1):6.2f} us cpu per tick"
+    )
+
+
+def main(count=10_000, frequency=10, duration=5):
+    print(f"{count} periodicals at {frequency} Hz for {duration} s")
+    measure("tasks", run_tasks, count, frequency, duration)
+    measure("scheduler", run_scheduler, count, frequency, duration)
+
+
+if __name__ == "__main__":
+    main(*(float(arg) if "." in arg else int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,47 @@
+"""Compare round trips of 1 MB numpy arrays through the messenger serializers.
+
+Usage: python benchmarks/serializers.py [count]
+
+'ndarray' packs the raw buffer as msgpack extension type, 'list' converts the array
+to a list first, like it had to be done before.
+"""
+
+import sys
+import time
+
+import msgpack
+import numpy as np
+
+from async_app.serializers import serializers
+
+
+def ndarray_round_trip(array):
+    pack, unpack = serializers["msgpack"]
+    packed = pack(array)
+    return unpack(packed), len(packed)
+
+
+def list_round_trip(array):
+    packed = msgpack.packb(array.tolist())
+    return np.array(msgpack.unpackb(packed), dtype=array.dtype), len(packed)
+
+
+def main(count=100):
+    array = np.random.default_rng().random(2**17)  # 1 MB of float64
+    for name, round_trip in (
+        ("ndarray", ndarray_round_trip),
+        ("list", list_round_trip),
+    ):
+        tic = time.perf_counter()
+        for _ in range(int(count)):
+            result, size = round_trip(array)
+        toc = time.perf_counter()
+        assert np.array_equal(result, array)
+        print(
+            f"{name:>8}: {1e3 * (toc - tic) / count:8.3f} ms per round trip, "
+            f"{size / 2**20:.2f} MB packed"
+        )
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:]))
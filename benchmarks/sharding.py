@@ -0,0 +1,56 @@
+"""Scaling of a CPU-bound periodic workload over worker processes.
+
+Usage: python benchmarks/sharding.py [duration] [max_workers]
+"""
+
+import os
+import sys
+import asyncio
+
+from async_app.app import AsyncApp
+import async_app.state as app_state
+
+
+def burn(n=50_000):
+    """About a few milliseconds of pure Python work."""
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def run(workers, duration, tasks=64, frequency=100):
+    app_state.reset()
+    app = AsyncApp(workers=workers)
+    for _ in range(tasks):
+        app.add_task_description(
+            {"kind": "periodic", "function": burn, "frequency": frequency}
+        )
+
+    async def main():
+        asyncio.get_running_loop().call_later(duration, app.exit)
+        await app.run()
+
+    asyncio.run(main())
+
+    statistics = (
+        app.shard_statistics.values() if workers > 1 else [app.scheduler.statistics()]
+    )
+    return sum(entry["ticks"] for shard in statistics for entry in shard.values())
+
+
+def main(duration=5, max_workers=os.cpu_count()):
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        ticks = run(workers, duration)
+        baseline = baseline or ticks
+        print(
+            f"{workers:>3} workers: {ticks / duration:10.1f} calls/s, "
+            f"speedup {ticks / baseline:5.2f}"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
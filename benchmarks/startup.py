@@ -0,0 +1,40 @@
+"""Measure the import time of async_app modules.
+
+Usage: python benchmarks/startup.py [module] [count]
+
+Runs 'python -X importtime -c "import module"' 'count' times, and reports the best
+total and the slowest imports of the best run.
+"""
+
+import sys
+import subprocess
+
+
+def importtime(module):
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # nested imports are indented further
+        timings.append((int(cumulative_us), name[1:]))
+    total = sum(cumulative for cumulative, name in timings if name == name.lstrip())
+    return total, [(cumulative, name.strip()) for cumulative, name in timings]
+
+
+def main(module="async_app.app_factory", count=5):
+    runs = [importtime(module) for _ in range(int(count))]
+    total, timings = min(runs)
+    print(f"import {module}: {total / 1000:.1f} ms")
+    for cumulative, name in sorted(timings, reverse=True)[:10]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
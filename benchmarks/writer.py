@@ -0,0 +1,44 @@
+"""Measure messenger publish throughput for different batch sizes.
+
+Usage: python benchmarks/writer.py [count]
+
+Publishes 'count' records from as many concurrent publishers. Needs a running
+redis-server.
+"""
+
+import sys
+import time
+import asyncio
+
+import async_app.messenger as app_messenger
+
+
+async def throughput(count, max_batch_size, namespace="async_app:benchmark:writer"):
+    app_messenger.get_backend().writer.max_batch_size = max_batch_size
+    record = {"cpu_percent": 12.5, "mem_percent": 42.0, "disk_percent": 80.1}
+
+    tic = time.perf_counter()
+    await asyncio.gather(
+        *(app_messenger.publish_and_set(namespace, record) for _ in range(count))
+    )
+    toc = time.perf_counter()
+    await app_messenger.close_redis()
+    # the client of the backend is closed, start over with a new one
+    app_messenger.set_backend("redis")
+
+    return count / (toc - tic)
+
+
+def main(count=10000):
+    app_messenger.set_backend("redis")
+    for max_batch_size in (1, 10, 100, 1000):
+        try:
+            rate = asyncio.run(throughput(int(count), max_batch_size))
+        except Exception as e:
+            print(f"writer benchmark skipped ({e!r})")
+            return
+        print(f"batch size {max_batch_size:>5}: {rate:10.1f} records/s")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:]))
@@ -14,11 +14,11 @@ def say_hello(to="You"):
 async def exit_after(exit_after):
     print(f"{exit_after=}")
     await asyncio.sleep(exit_after)
-    app_state.keep_running = False
+    app_state.stop()
 
 
 def main():
-    app = AsyncApp()
+    app = AsyncApp(debug=True)
     tasks = [
         {
             "kind": "periodic",
@@ -37,7 +37,7 @@ def main():
     for task in tasks:
         app.add_task_description(task)
 
-    asyncio.run(app.run(), debug=True)
+    app.serve()
 
 
 if __name__ == "__main__":
@@ -38,7 +38,7 @@ async def return_42():
 async def exit_after(exit_after):
     print(f"{exit_after=}")
     await asyncio.sleep(exit_after)
-    app_state.keep_running = False
+    app_state.stop()
 
 
 def thats_was(what="it"):
@@ -46,7 +46,7 @@ def thats_was(what="it"):
 
 
 def main():
-    app = AsyncApp()
+    app = AsyncApp(debug=True)
     tasks = [
         {
             "kind": "periodic",
@@ -134,7 +134,7 @@ def main():
     for task in tasks:
         app.add_task_description(task)
 
-    asyncio.run(app.run(), debug=True)
+    app.serve()
 
 
 if __name__ == "__main__":
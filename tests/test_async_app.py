@@ -2,10 +2,15 @@
 
 """Tests for `async_app` package."""
 
-
+import asyncio
+import json
+import tempfile
+import threading
 import unittest
+from pathlib import Path
 
 from async_app.app import AsyncApp
+from async_app.sinks import JSONLinesSink
 
 
 class TestAddTaskDescriptions(unittest.TestCase):
@@ -36,3 +41,176 @@ class TestAddTaskDescriptions(unittest.TestCase):
             app.add_task_description(task_description)
 
         self.assertEqual(len(app.task_descriptions["periodic"]), 1)
+
+    def test_unknown_executor(self):
+        app = AsyncApp()
+        app.add_task_description(
+            {
+                "kind": "continuous",
+                "function": lambda: print("Hello"),
+                "executor": "gpu",
+            }
+        )
+
+        self.assertEqual(len(app.task_descriptions["continuous"]), 0)
+
+    def test_process_executor_for_continuous_task(self):
+        app = AsyncApp()
+        app.add_task_description(
+            {
+                "kind": "continuous",
+                "function": lambda: print("Hello"),
+                "executor": "process",
+            }
+        )
+
+        self.assertEqual(len(app.task_descriptions["continuous"]), 0)
+
+    def test_thread_pool_reserves_workers_for_continuous_tasks(self):
+        app = AsyncApp(thread_pool_size=2)
+        for _ in range(3):
+            app.add_task_description(
+                {"kind": "continuous", "function": lambda: print("Hello")}
+            )
+        pool = app.get_executor("thread")
+
+        self.assertEqual(pool._max_workers, 5)
+        pool.shutdown()
+
+
+class TestExecutors(unittest.IsolatedAsyncioTestCase):
+
+    async def run_continuous(self, executor):
+        app = AsyncApp()
+        app.add_task_description(
+            {
+                "kind": "continuous",
+                "function": threading.get_ident,
+                "executor": executor,
+            }
+        )
+        tasks = await app.create_tasks("continuous")
+        result = await tasks[0]
+        await app.shutdown_executors()
+        return result
+
+    async def test_loop_executor(self):
+        self.assertEqual(await self.run_continuous("loop"), threading.get_ident())
+
+    async def test_thread_executor(self):
+        self.assertNotEqual(await self.run_continuous("thread"), threading.get_ident())
+
+
+class TestTaskMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_counts_and_changes(self):
+        async def fail():
+            1 / 0
+
+        app = AsyncApp()
+        app.add_task_description({"kind": "continuous", "function": fail})
+        app.add_task_description(
+            {"kind": "continuous", "function": asyncio.sleep, "args": (10,)}
+        )
+        tasks = await app.create_tasks("continuous")
+        await asyncio.wait(tasks, timeout=0.05)
+
+        self.assertEqual(app.task_counts["running"], 1)
+        self.assertEqual(app.task_counts["failed"], 1)
+
+        states = [change["state"] for change in app.task_changes]
+        self.assertEqual(states, ["running", "running", "failed"])
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+        self.assertEqual(app.task_counts["cancelled"], 1)
+        self.assertEqual(app.running_tasks, set())
+
+
+class TestResultSink(unittest.IsolatedAsyncioTestCase):
+
+    async def test_ring_buffer_keeps_the_latest_results(self):
+        async def answer(value):
+            return value
+
+        app = AsyncApp(result_buffer_size=2)
+        for value in range(3):
+            app.add_task_description(
+                {"kind": "continuous", "function": answer, "args": (value,)}
+            )
+        results = await asyncio.wait_for(app.run(), 2)
+
+        self.assertEqual([result["result"] for result in results], [1, 2])
+        self.assertEqual(app.result_summary.as_dict()["done"], 3)
+
+    async def test_jsonl_sink(self):
+        async def answer():
+            return 42
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl"
+            app = AsyncApp(result_sink="jsonl", result_file=path)
+            app.add_task_description({"kind": "continuous", "function": answer})
+            results = await asyncio.wait_for(app.run(), 2)
+
+            self.assertEqual(results, [])
+            record = json.loads(path.read_text())
+            self.assertEqual(record["result"], 42)
+
+    async def test_jsonl_sink_writes_off_the_loop(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "results.jsonl"
+            sink = JSONLinesSink(path, flush_interval=0.01)
+            for value in range(3):
+                sink.add({"name": "answer", "result": value})
+            self.assertEqual(path.read_text(), "")
+
+            await asyncio.sleep(0.05)
+            sink.add({"name": "answer", "result": 3})
+            sink.close()
+
+            lines = path.read_text().splitlines()
+            results = [json.loads(line)["result"] for line in lines]
+            self.assertEqual(results, [0, 1, 2, 3])
+
+    async def test_callback_sink(self):
+        async def fail():
+            1 / 0
+
+        records = []
+        app = AsyncApp(result_sink=records.append)
+        app.add_task_description({"kind": "continuous", "function": fail})
+        await asyncio.wait_for(app.run(), 2)
+
+        self.assertEqual(records[0]["state"], "failed")
+        self.assertEqual(app.result_summary.as_dict()["failed"], 1)
+
+
+class TestTaskStatistics(unittest.IsolatedAsyncioTestCase):
+
+    async def test_observed_tasks(self):
+        calls = []
+
+        def tick():
+            calls.append(1)
+
+        async def answer():
+            await asyncio.sleep(0.01)
+            return 42
+
+        app = AsyncApp(task_statistics=True)
+        app.add_task_description({"kind": "continuous", "function": answer})
+        app.add_task_description(
+            {"kind": "periodic", "function": tick, "frequency": 50}
+        )
+        asyncio.get_running_loop().call_later(0.3, app.exit)
+        await asyncio.wait_for(app.run(), 2)
+
+        snapshot = {
+            entry["name"]: entry for entry in app.statistics_snapshot().values()
+        }
+        self.assertEqual(snapshot["answer"]["count"], 1)
+        self.assertGreaterEqual(snapshot["answer"]["duration"]["p99"], 0.009)
+        self.assertEqual(snapshot["tick"]["count"], len(calls))
+        self.assertAlmostEqual(snapshot["tick"]["rate"], 50, delta=10)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""Tests for task dependencies in `async_app`."""
+
+import asyncio
+import threading
+import unittest
+
+import async_app.state as app_state
+
+from async_app.app import AsyncApp
+
+
+class TestTaskGraph(unittest.IsolatedAsyncioTestCase):
+
+    async def run_init(self, task_descriptions):
+        app = AsyncApp()
+        for task_description in task_descriptions:
+            app.add_task_description(task_description)
+        app.graph.build(app.task_descriptions["init"])
+        tasks = await app.create_tasks("init")
+        await asyncio.wait(tasks)
+        return app, tasks
+
+    async def test_resources_are_passed_to_dependents(self):
+        async def fetch_config():
+            await asyncio.sleep(0.01)
+            return {"dsn": "db://"}
+
+        async def connect(config):
+            return config["dsn"]
+
+        app, tasks = await self.run_init(
+            [
+                {"kind": "init", "function": connect, "depends_on": "config"},
+                {"kind": "init", "function": fetch_config, "provides": "config"},
+            ]
+        )
+
+        self.assertEqual(tasks[0].result(), "db://")
+        path = app.report_critical_path()
+        self.assertEqual([name for name, _ in path], ["fetch_config", "connect"])
+
+    async def test_independent_tasks_run_in_parallel(self):
+        async def slow():
+            await asyncio.sleep(0.1)
+
+        loop = asyncio.get_running_loop()
+        tic = loop.time()
+        await self.run_init([{"kind": "init", "function": slow} for _ in range(5)])
+
+        self.assertLess(loop.time() - tic, 0.3)
+
+    async def test_failed_dependency(self):
+        async def failing():
+            1 / 0
+
+        async def dependent(resource):
+            return resource
+
+        app, tasks = await self.run_init(
+            [
+                {"kind": "init", "function": failing, "provides": "resource"},
+                {"kind": "init", "function": dependent, "depends_on": ["resource"]},
+            ]
+        )
+
+        self.assertIsInstance(tasks[1].exception(), RuntimeError)
+
+    async def test_circular_dependency(self):
+        async def a(b):
+            return "a"
+
+        async def b(a):
+            return "b"
+
+        app, tasks = await self.run_init(
+            [
+                {"kind": "init", "function": a, "provides": "a", "depends_on": "b"},
+                {"kind": "init", "function": b, "provides": "b", "depends_on": "a"},
+            ]
+        )
+
+        for task in tasks:
+            self.assertIsInstance(task.exception(), RuntimeError)
+
+
+class TestTaskGraphRun(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        app_state.reset()
+
+    async def test_resources_in_results(self):
+        def create_lock():
+            return threading.Lock()
+
+        async def use_lock(lock):
+            return lock.locked()
+
+        app = AsyncApp()
+        app.add_task_description(
+            {"kind": "init", "function": create_lock, "provides": "lock"}
+        )
+        app.add_task_description(
+            {"kind": "continuous", "function": use_lock, "depends_on": "lock"}
+        )
+        results = await asyncio.wait_for(app.run(), 3)
+
+        self.assertEqual(results[1]["result"], False)
+
+    async def test_init_depending_on_continuous_is_rejected(self):
+        async def server():
+            return "server"
+
+        async def register(server):
+            return server
+
+        app = AsyncApp()
+        app.add_task_description(
+            {"kind": "init", "function": register, "depends_on": "server"}
+        )
+        app.add_task_description(
+            {"kind": "continuous", "function": server, "provides": "server"}
+        )
+        results = await asyncio.wait_for(app.run(), 3)
+
+        self.assertIsNotNone(results[0]["exception"])
+        self.assertEqual(results[1]["result"], "server")
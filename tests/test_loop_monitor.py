@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.loop_monitor`."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.state as app_state
+from async_app.app import AsyncApp
+from async_app.loop_monitor import LoopMonitor
+
+
+class TestLoopMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stalls_are_attributed_to_tasks(self):
+        async def blocker():
+            time.sleep(0.2)
+
+        monitor = LoopMonitor(threshold=0.05)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            await asyncio.create_task(blocker(), name="blocker")
+            await asyncio.sleep(0.05)
+        finally:
+            monitor.stop()
+
+        record = monitor.snapshot()
+        self.assertEqual(len(record["stalls"]), 1)
+        stall = record["stalls"][0]
+        self.assertEqual(stall["task"], "blocker")
+        self.assertGreater(stall["duration"], 0.15)
+        self.assertTrue(any("blocker" in line for line in stall["stack"]))
+        self.assertGreater(record["lag"]["max"], 0.15)
+        self.assertEqual(sum(record["lag"]["histogram"]), record["lag"]["count"])
+
+        self.assertEqual(monitor.snapshot()["stalls"], [])
+
+    async def test_no_stall_is_lost_between_snapshots(self):
+        monitor = LoopMonitor(threshold=0.05, max_stalls=1000)
+        monitor._loop = asyncio.get_running_loop()
+        monitor._thread_id = threading.get_ident()
+
+        def capture():
+            for _ in range(200):
+                monitor._capture(0.1)
+
+        watchdog = threading.Thread(target=capture)
+        watchdog.start()
+        stalls = []
+        while watchdog.is_alive():
+            stalls += monitor.snapshot()["stalls"]
+        watchdog.join()
+        stalls += monitor.snapshot()["stalls"]
+
+        self.assertEqual(len(stalls), 200)
+
+
+class TestAppLoopMonitor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_state.reset()
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_loop_monitor_is_published(self):
+        app = AsyncApp(loop_monitoring_frequency=20)
+        asyncio.get_running_loop().call_later(0.3, app.exit)
+        await asyncio.wait_for(app.run(), 2)
+
+        record = await app_messenger.get(f"{app.name}:loop_monitor")
+        self.assertGreater(record["lag"]["count"], 0)
+        self.assertFalse(app.loop_monitoring.running)
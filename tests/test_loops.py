@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.loops`."""
+
+import asyncio
+import unittest
+
+import click
+from click.testing import CliRunner
+
+import async_app.loops as app_loops
+from async_app.app import AsyncApp
+from async_app.app_factory import async_app_options
+from async_app.tools import app_env_prefix
+
+
+class TestLoops(unittest.TestCase):
+
+    def test_asyncio_loop(self):
+        self.assertIs(app_loops.loop_factory("asyncio"), asyncio.new_event_loop)
+
+    def test_unknown_loop(self):
+        with self.assertRaises(ValueError):
+            app_loops.loop_factory("trio")
+
+    def test_run_with_debug_settings(self):
+        async def settings():
+            loop = asyncio.get_running_loop()
+            return loop.get_debug(), loop.slow_callback_duration
+
+        self.assertEqual(app_loops.run(settings(), "asyncio", True, 0.5), (True, 0.5))
+
+    def test_run_cleans_up_without_runner(self):
+        cancelled = []
+
+        async def left_behind():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def main():
+            asyncio.create_task(left_behind())
+            await asyncio.sleep(0)
+            return 42
+
+        # the path taken before Python 3.11
+        runner = asyncio.Runner
+        del asyncio.Runner
+        try:
+            self.assertEqual(app_loops.run(main(), "asyncio"), 42)
+        finally:
+            asyncio.Runner = runner
+        self.assertEqual(cancelled, [True])
+
+    def test_options_leave_loop_settings_to_the_environment(self):
+        @click.command()
+        @async_app_options
+        def main(**kwargs):
+            app = AsyncApp(**kwargs)
+            click.echo(f"{app.event_loop} {app.debug} {app.slow_callback_duration}")
+
+        result = CliRunner().invoke(
+            main,
+            [],
+            env={
+                f"{app_env_prefix}_EVENT_LOOP": "asyncio",
+                f"{app_env_prefix}_DEBUG": "true",
+                f"{app_env_prefix}_SLOW_CALLBACK_DURATION": "0.5",
+            },
+        )
+        self.assertEqual(result.output.splitlines()[-1], "asyncio True 0.5")
+        result = CliRunner().invoke(main, ["--event-loop", "uvloop", "--no-debug"])
+        self.assertEqual(result.output.splitlines()[-1], "uvloop False 0.1")
+
+    def test_serve(self):
+        app = AsyncApp(event_loop="asyncio")
+        app.add_task_description(
+            {"kind": "continuous", "function": lambda: 42, "executor": "loop"}
+        )
+
+        self.assertEqual(app.serve()[0]["result"], 42)
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.messenger`."""
+
+import asyncio
+import threading
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.state as app_state
+from async_app.messenger import BatchWriter, GetCache, ListenerQueue
+from async_app.messenger import SubscriptionManager, packer
+
+
+class Pipeline(object):
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def publish(self, namespace, data):
+        self.operations.append(("publish", namespace, data))
+
+    def set(self, namespace, data):
+        self.operations.append(("set", namespace, data))
+
+    async def execute(self):
+        self.client.executed.append(self.operations)
+
+
+class Client(object):
+    """Records the operations of each executed pipeline."""
+
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+
+class TestBatchWriter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_operations_are_coalesced(self):
+        client = Client()
+        writer = BatchWriter(client, flush_interval=0.01)
+
+        await asyncio.gather(
+            *(writer.submit("publish", "ns", i) for i in range(10)),
+            writer.submit("set", "ns", 9),
+        )
+
+        self.assertEqual(len(client.executed), 1)
+        self.assertEqual(len(client.executed[0]), 11)
+
+    async def test_batches_are_limited_in_size(self):
+        client = Client()
+        writer = BatchWriter(client, flush_interval=10, max_batch_size=4)
+
+        await asyncio.wait_for(
+            asyncio.gather(*(writer.submit("publish", "ns", i) for i in range(8))), 1
+        )
+
+        self.assertEqual([len(batch) for batch in client.executed], [4, 4])
+        self.assertEqual(writer.operations_sent, 8)
+
+    async def test_flush(self):
+        client = Client()
+        writer = BatchWriter(client, flush_interval=10)
+
+        task = asyncio.create_task(writer.submit("set", "ns", 1))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(writer.flush(), 1)
+
+        self.assertEqual(client.executed, [[("set", "ns", 1)]])
+        await task
+
+
+class PubSub(object):
+    """Hands out the messages put into 'messages'."""
+
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.subscribed = []
+
+    async def subscribe(self, namespace):
+        self.subscribed.append(namespace)
+
+    async def psubscribe(self, namespace):
+        self.subscribed.append(namespace)
+
+    async def unsubscribe(self, namespace):
+        self.subscribed.remove(namespace)
+
+    async def punsubscribe(self, namespace):
+        self.subscribed.remove(namespace)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        if timeout is None:
+            return await self.messages.get()
+        try:
+            return self.messages.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    async def aclose(self):
+        pass
+
+
+class PubSubClient(object):
+    def __init__(self):
+        self.connections = []
+
+    def pubsub(self):
+        self.connections.append(PubSub())
+        return self.connections[-1]
+
+
+class TestSubscriptionManager(unittest.IsolatedAsyncioTestCase):
+
+    async def test_one_connection_for_channels_and_patterns(self):
+        client = PubSubClient()
+        subscriptions = SubscriptionManager(client)
+        received = []
+
+        await subscriptions.subscribe("a", lambda data: received.append(("a", data)))
+        await subscriptions.subscribe("a", lambda data: received.append(("a2", data)))
+        await subscriptions.subscribe("b:*", lambda data: received.append(("b", data)))
+
+        self.assertEqual(len(client.connections), 1)
+        pubsub = client.connections[0]
+        self.assertEqual(pubsub.subscribed, ["a", "b:*"])
+
+        pubsub.messages.put_nowait(
+            {"type": "message", "channel": b"a", "data": packer(1)}
+        )
+        pubsub.messages.put_nowait(
+            {
+                "type": "pmessage",
+                "pattern": b"b:*",
+                "channel": b"b:1",
+                "data": packer(2),
+            }
+        )
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(received, [("a", 1), ("a2", 1), ("b", 2)])
+        await subscriptions.close()
+
+    async def test_unsubscribe_with_the_last_callback(self):
+        client = PubSubClient()
+        subscriptions = SubscriptionManager(client)
+
+        def first(data):
+            pass
+
+        def second(data):
+            pass
+
+        await subscriptions.subscribe("a", first)
+        await subscriptions.subscribe("a", second)
+        pubsub = client.connections[0]
+
+        await subscriptions.unsubscribe("a", first)
+        self.assertEqual(pubsub.subscribed, ["a"])
+        await subscriptions.unsubscribe("a", second)
+        self.assertEqual(pubsub.subscribed, [])
+        await subscriptions.close()
+
+
+class TestLocalBackend(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_state.reset()
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_set_and_get(self):
+        record = {"value": 1}
+        await app_messenger.set("ns", record)
+
+        self.assertIs(await app_messenger.get("ns"), record)
+        self.assertIsNone(await app_messenger.get("unknown"))
+
+    async def test_listeners(self):
+        received = []
+
+        async def on_pattern(data):
+            received.append(("pattern", data))
+
+        listeners = [
+            asyncio.create_task(
+                app_messenger.listener("a:1", lambda data: received.append(("a", data)))
+            ),
+            asyncio.create_task(app_messenger.listener("a:*", on_pattern)),
+        ]
+        await asyncio.sleep(0)
+        await app_messenger.publish_and_set("a:1", 1)
+        await app_messenger.publish("b:1", 2)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(received, [("a", 1), ("pattern", 1)])
+        self.assertEqual(await app_messenger.get("a:1"), 1)
+        statistics = app_messenger.listener_statistics()
+        self.assertEqual([entry["processed"] for entry in statistics], [1, 1])
+
+        app_state.stop()
+        await asyncio.wait_for(asyncio.gather(*listeners), 1)
+        await app_messenger.close_redis()
+
+    async def test_stream_consumers_share_a_group(self):
+        batches = {"first": [], "second": [], "other": []}
+
+        def collect(name):
+            return lambda batch: batches[name].append(batch)
+
+        for i in range(3):
+            await app_messenger.append("stream", i)
+        consumers = [
+            asyncio.create_task(
+                app_messenger.consumer("stream", "group", collect(name), batch_size=2)
+            )
+            for name in ("first", "second")
+        ]
+        consumers.append(
+            asyncio.create_task(
+                app_messenger.consumer("stream", "other_group", collect("other"))
+            )
+        )
+        await asyncio.sleep(0.01)
+        await app_messenger.append("stream", 3)
+        await asyncio.sleep(0.01)
+
+        group = sorted(
+            data for batch in batches["first"] + batches["second"] for data in batch
+        )
+        self.assertEqual(group, [0, 1, 2, 3])
+        self.assertEqual(batches["first"][0], [0, 1])
+        self.assertEqual(batches["other"], [[0, 1, 2], [3]])
+
+        app_state.stop()
+        await asyncio.wait_for(asyncio.gather(*consumers), 1)
+
+    async def test_streams_are_trimmed(self):
+        for i in range(5):
+            await app_messenger.append("trimmed", i, maxlen=2)
+
+        stream = app_messenger.get_backend().streams["trimmed"]
+        self.assertEqual(stream.read("group", 10), [3, 4])
+
+
+class TestGetCache(unittest.TestCase):
+
+    def test_least_recently_used_are_evicted(self):
+        cache = GetCache(maxsize=2)
+        for namespace in ("a", "b"):
+            cache.store(namespace, namespace, cache.generation)
+        cache.lookup("a")
+        cache.store("c", "c", cache.generation)
+
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.statistics()["evictions"], 1)
+
+    def test_values_expire(self):
+        cache = GetCache(ttl=-1)
+        cache.store("a", 1, cache.generation)
+
+        self.assertEqual(cache.lookup("a"), (False, None))
+
+    def test_invalidated_reads_are_not_stored(self):
+        cache = GetCache()
+        generation = cache.generation
+        cache.invalidate(["a"])
+        cache.store("a", "stale", generation)
+
+        self.assertEqual(cache.lookup("a"), (False, None))
+
+    def test_opt_in_by_pattern(self):
+        cache = GetCache()
+        cache.enable("config:*")
+        cache.enable("latest")
+
+        self.assertTrue(cache.is_enabled("config:app"))
+        self.assertFalse(cache.is_enabled("other"))
+        self.assertEqual(cache.prefixes(), {"config:", "latest"})
+
+
+class GetClient(Client):
+    """Counts reads. Client tracking is not available."""
+
+    def __init__(self, values):
+        super().__init__()
+        self.values = values
+        self.reads = 0
+
+    async def get(self, namespace):
+        self.reads += 1
+        return self.values.get(namespace, None)
+
+    def pubsub(self):
+        raise ConnectionError("no pubsub")
+
+
+class TestCachedGet(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hot_keys_are_read_once(self):
+        client = GetClient({"config:app": packer({"level": 1})})
+        backend = app_messenger.RedisBackend(client)
+        backend.cache.enable("config:*")
+
+        for _ in range(3):
+            self.assertEqual(await backend.get("config:app"), {"level": 1})
+
+        self.assertEqual(client.reads, 1)
+        self.assertEqual(backend.cache.statistics()["hits"], 2)
+
+        await backend.set("config:app", {"level": 2})
+        self.assertNotIn("config:app", backend.cache.entries)
+
+
+class TestListenerQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def test_overflow_policies(self):
+        for overflow, expected in (("drop_oldest", [1, 2]), ("drop_newest", [0, 1])):
+            with self.subTest(overflow=overflow):
+                listener_queue = ListenerQueue(
+                    "ns", print, maxsize=2, overflow=overflow
+                )
+                for i in range(3):
+                    await listener_queue.put(i)
+
+                self.assertEqual(list(listener_queue.queue._queue), expected)
+                self.assertEqual(listener_queue.statistics()["dropped"], 1)
+
+    async def test_workers_run_in_parallel(self):
+        async def slow(data):
+            await asyncio.sleep(0.05)
+
+        listener_queue = ListenerQueue("ns", slow, workers=4)
+        for i in range(4):
+            await listener_queue.put(i)
+        task = asyncio.create_task(listener_queue.run())
+
+        await asyncio.wait_for(listener_queue.queue.join(), 0.1)
+        self.assertEqual(listener_queue.statistics()["processed"], 4)
+        task.cancel()
+
+    async def test_sync_callbacks_on_threads(self):
+        threads = []
+        listener_queue = ListenerQueue(
+            "ns", lambda data: threads.append(threading.get_ident()), executor="thread"
+        )
+        await listener_queue.put(1)
+        task = asyncio.create_task(listener_queue.run())
+
+        await asyncio.wait_for(listener_queue.queue.join(), 1)
+        self.assertNotEqual(threads, [threading.get_ident()])
+        task.cancel()
+
+    def test_unknown_overflow(self):
+        with self.assertRaises(ValueError):
+            ListenerQueue("ns", print, overflow="grow")
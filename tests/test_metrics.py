@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.metrics`."""
+
+import asyncio
+import socket
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.metrics as app_metrics
+import async_app.state as app_state
+from async_app.app import AsyncApp
+from async_app.metrics import Registry
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def scrape(port, request=b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    response = await reader.read()
+    writer.close()
+    header, _, body = response.partition(b"\r\n\r\n")
+    return header.split(b"\r\n")[0], body.decode()
+
+
+class TestRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_text_format(self):
+        counter = self.registry.counter("requests_total", "Requests.", ("path",))
+        counter.labels('/a"b\\').inc()
+        counter.labels('/a"b\\').inc(2)
+        self.registry.gauge("temperature", "Line\nbreak.").set(float("nan"))
+
+        self.assertEqual(
+            self.registry.render().decode(),
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{path="/a\\"b\\\\"} 3\n'
+            "# HELP temperature Line\\nbreak.\n"
+            "# TYPE temperature gauge\n"
+            "temperature NaN\n",
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram(
+            "duration_seconds", "Durations.", ("task",), buckets=(0.1, 1.0)
+        )
+        child = histogram.labels("a")
+        for value in (0.05, 0.1, 0.5, 2.0):
+            child.observe(value)
+
+        lines = self.registry.render().decode().splitlines()[2:]
+        self.assertEqual(
+            lines,
+            [
+                'duration_seconds_bucket{task="a",le="0.1"} 2',
+                'duration_seconds_bucket{task="a",le="1.0"} 3',
+                'duration_seconds_bucket{task="a",le="+Inf"} 4',
+                'duration_seconds_sum{task="a"} 2.65',
+                'duration_seconds_count{task="a"} 4',
+            ],
+        )
+
+    def test_registration(self):
+        counter = self.registry.counter("calls_total", "Calls.", ("task",))
+        self.assertIs(
+            self.registry.counter("calls_total", "Calls.", ("task",)), counter
+        )
+        with self.assertRaises(ValueError):
+            self.registry.gauge("calls_total", "Calls.", ("task",))
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+    def test_records_and_collectors(self):
+        def failing():
+            raise RuntimeError("broken")
+
+        self.registry.add_collector(failing)
+        self.registry.add_collector(
+            lambda: self.registry.set_record(
+                "monitor", {"cpu": {"percent": 5.5}, "name": "x", "ok": True}
+            )
+        )
+
+        text = self.registry.render().decode()
+        self.assertIn("monitor_cpu_percent 5.5\n", text)
+        self.assertNotIn("monitor_name", text)
+        self.assertNotIn("monitor_ok", text)
+
+    def test_buffer_is_reused(self):
+        gauge = self.registry.gauge("size", "Size.", ("i",))
+        for i in range(5000):
+            gauge.labels(i).set(i)
+        first = self.registry.render()
+        buffer = self.registry._output.buffer
+
+        self.assertEqual(self.registry.render(), first)
+        self.assertIs(self.registry._output.buffer, buffer)
+
+    def test_view_and_excluded_keys(self):
+        self.registry.set_record("process", {"pid": 42, "threads": 3}, exclude=("pid",))
+
+        with self.registry.render_view() as view:
+            text = bytes(view)
+        self.assertIn(b"process_threads 3\n", text)
+        self.assertNotIn(b"process_pid", text)
+
+        buffer = self.registry._output.buffer
+        self.registry.detach_buffer()
+        self.assertEqual(self.registry.render(), text)
+        self.assertIsNot(self.registry._output.buffer, buffer)
+
+
+class TestEndpoint(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_state.reset()
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_app_metrics_are_served(self):
+        port = free_port()
+        app = AsyncApp(
+            metrics_port=port,
+            metrics_host="127.0.0.1",
+            loop_monitoring_frequency=20,
+            task_statistics=True,
+        )
+
+        async def tick():
+            await app_messenger.publish("test:metrics", {"value": 1})
+
+        app.add_task_description(
+            {"kind": "periodic", "function": tick, "frequency": 50}
+        )
+        run = asyncio.create_task(app.run())
+        await asyncio.sleep(0.3)
+
+        status, body = await scrape(port)
+        self.assertEqual(status, b"HTTP/1.1 200 OK")
+        self.assertIn(f'async_app_tasks_running{{app="{app.name}"}} ', body)
+        self.assertIn('async_app_periodical_ticks_total{app="', body)
+        self.assertIn('async_app_task_calls_total{app="', body)
+        self.assertIn("async_app_loop_lag_seconds_bucket{", body)
+        self.assertIn('async_app_messenger_operations_total{operation="publish"}', body)
+
+        status, body = await scrape(port, b"GET /other HTTP/1.1\r\n\r\n")
+        self.assertEqual(status, b"HTTP/1.1 404 Not Found")
+
+        app.exit()
+        await asyncio.wait_for(run, 2)
+        with self.assertRaises(OSError):
+            await scrape(port)
+
+    async def test_listener_samples_are_kept(self):
+        blocked = asyncio.Event()
+
+        async def wait(data):
+            await blocked.wait()
+
+        listeners = [
+            asyncio.create_task(app_messenger.listener("metrics:a", wait))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        for i in range(3):
+            await app_messenger.publish("metrics:a", i)
+        await asyncio.sleep(0.01)
+
+        registry = app_metrics.registry
+        depth = registry.metrics["async_app_messenger_listener_queue_depth"]
+        registry.render()
+        sample = depth.labels("metrics:a")
+        text = registry.render().decode()
+        self.assertIs(depth.labels("metrics:a"), sample)
+        # each message waits in both queues, one per queue is taken by the worker
+        self.assertIn(
+            'async_app_messenger_listener_queue_depth{namespace="metrics:a"} 4', text
+        )
+
+        app_state.stop()
+        await asyncio.wait_for(asyncio.gather(*listeners), 1)
+        self.assertNotIn(b'namespace="metrics:a"', registry.render())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.patterns`."""
+
+import asyncio
+import unittest
+
+import async_app.state as app_state
+from async_app.patterns import next_tick, periodical
+
+
+class TestNextTick(unittest.TestCase):
+
+    def test_on_time(self):
+        self.assertEqual(next_tick(0, 0.0, 1.0, 0.5), (1, 0, 0))
+
+    def test_skip(self):
+        # ticks 1, 2 and 3 have been missed
+        self.assertEqual(next_tick(0, 0.0, 1.0, 3.5, "skip"), (4, 3, 0))
+
+    def test_catch_up(self):
+        self.assertEqual(next_tick(0, 0.0, 1.0, 3.5, "catch_up"), (1, 0, 0))
+
+    def test_coalesce(self):
+        # a single call for ticks 1, 2 and 3
+        self.assertEqual(next_tick(0, 0.0, 1.0, 3.5, "coalesce"), (3, 0, 2))
+
+
+class TestPeriodical(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        app_state.reset()
+
+    async def test_slow_calls_drop_ticks(self):
+        stats = {}
+
+        async def slow():
+            await asyncio.sleep(0.025)
+
+        task = asyncio.create_task(periodical(100, stats=stats)(slow)())
+        await asyncio.sleep(0.2)
+        app_state.stop()
+        await task
+
+        self.assertGreater(stats["ticks"], 0)
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["coalesced"], 0)
+
+    def test_unknown_overrun_policy(self):
+        with self.assertRaises(ValueError):
+            periodical(1, overrun="never")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.scheduler`."""
+
+import asyncio
+import time
+import unittest
+
+import async_app.state as app_state
+from async_app.scheduler import PeriodicScheduler
+
+
+class TestPeriodicScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        app_state.reset()
+
+    def tearDown(self):
+        app_state.reset()
+
+    async def run_for(self, scheduler, duration):
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(duration)
+        app_state.stop()
+        return await asyncio.wait_for(task, 3)
+
+    async def test_sync_and_async_periodicals(self):
+        calls = {"sync": 0, "async": 0}
+
+        def sync_tick():
+            calls["sync"] += 1
+
+        async def async_tick():
+            calls["async"] += 1
+
+        scheduler = PeriodicScheduler()
+        scheduler.add("sync", sync_tick, 100)
+        scheduler.add("async", async_tick, 100)
+        summary = await self.run_for(scheduler, 0.2)
+
+        self.assertGreater(calls["sync"], 10)
+        self.assertGreater(calls["async"], 10)
+        self.assertEqual(summary["periodicals"], 2)
+
+    async def test_overrunning_sync_periodical_does_not_starve_the_loop(self):
+        def slow():
+            time.sleep(0.02)
+
+        scheduler = PeriodicScheduler()
+        # catching up keeps the next deadline in the past
+        scheduler.add("slow", slow, 100, overrun="catch_up")
+        summary = await self.run_for(scheduler, 0.1)
+
+        self.assertGreater(summary["ticks"], 0)
+
+    async def test_overrunning_periodical_stops_for_all_overrun_policies(self):
+        def slow():
+            time.sleep(0.025)
+
+        for overrun in ("catch_up", "coalesce"):
+            with self.subTest(overrun=overrun):
+                app_state.reset()
+                scheduler = PeriodicScheduler()
+                entry = scheduler.add("slow", slow, 100, overrun=overrun)
+                await self.run_for(scheduler, 0.15)
+
+                self.assertGreater(entry.ticks, 0)
+                if overrun == "coalesce":
+                    self.assertGreater(entry.coalesced, 0)
+                else:
+                    self.assertEqual(entry.coalesced + entry.dropped, 0)
+
+    async def test_failing_periodical_is_removed(self):
+        def failing():
+            1 / 0
+
+        scheduler = PeriodicScheduler()
+        scheduler.add("failing", failing, 100)
+        await self.run_for(scheduler, 0.05)
+
+        self.assertNotIn("failing", scheduler.entries)
+
+    async def test_max_concurrency_keeps_rate(self):
+        calls = {"started": 0}
+
+        async def slow_io():
+            calls["started"] += 1
+            await asyncio.sleep(0.05)
+
+        scheduler = PeriodicScheduler()
+        scheduler.add("slow", slow_io, 100, max_concurrency=10)
+        await self.run_for(scheduler, 0.2)
+
+        # a serial periodical would only have been started about 4 times
+        self.assertGreater(calls["started"], 15)
+
+    async def test_cancel_oldest(self):
+        async def hanging():
+            await asyncio.sleep(10)
+
+        scheduler = PeriodicScheduler(drain_timeout=0.1)
+        entry = scheduler.add(
+            "hanging",
+            hanging,
+            100,
+            max_concurrency=2,
+            concurrency_policy="cancel_oldest",
+        )
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(entry.running), 2)
+        self.assertGreater(entry.cancelled, 0)
+
+        # hanging calls are cancelled on exit
+        app_state.stop()
+        await asyncio.wait_for(task, 3)
+        self.assertEqual(len(entry.running), 0)
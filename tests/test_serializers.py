@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.serializers`."""
+
+import unittest
+
+import numpy as np
+
+import async_app.messenger as app_messenger
+from async_app.serializers import serializers
+
+
+class TestSerializers(unittest.TestCase):
+
+    def test_ndarray_round_trip(self):
+        pack, unpack = serializers["msgpack"]
+        array = np.arange(12, dtype="<f4").reshape(3, 4)[:, ::2]
+
+        record = unpack(pack({"frame": array, "mean": array.mean()}))
+
+        np.testing.assert_array_equal(record["frame"], array)
+        self.assertEqual(record["frame"].dtype, array.dtype)
+        self.assertAlmostEqual(record["mean"], float(array.mean()), places=5)
+        # a view on the received buffer
+        self.assertFalse(record["frame"].flags.writeable)
+
+    def test_structured_and_scalar_arrays(self):
+        pack, unpack = serializers["msgpack"]
+        point = np.dtype([("x", "<f8", (2,)), ("inner", [("a", "<i4"), ("b", "u1")])])
+        arrays = [
+            np.array([(1, 2.5), (3, 4.5)], dtype=[("a", "<i4"), ("b", "<f8")]),
+            np.zeros(3, dtype=point),
+            np.array(7.5),
+        ]
+
+        for array in arrays:
+            with self.subTest(dtype=array.dtype):
+                result = unpack(pack(array))
+                self.assertEqual(result.dtype, array.dtype)
+                self.assertEqual(result.shape, array.shape)
+                np.testing.assert_array_equal(result, array)
+
+    def test_json_converts_arrays_to_lists(self):
+        pack, unpack = serializers["json"]
+
+        self.assertEqual(unpack(pack(np.arange(3))), [0, 1, 2])
+
+    def test_object_arrays_are_rejected(self):
+        pack, _ = serializers["msgpack"]
+
+        with self.assertRaises(TypeError):
+            pack(np.array([object()]))
+
+
+class TestNamespaceSerializers(unittest.TestCase):
+
+    def tearDown(self):
+        app_messenger.namespace_serializers.clear()
+        app_messenger._serializer_cache.clear()
+
+    def test_serializer_by_pattern(self):
+        app_messenger.set_serializer("debug:*", "json")
+
+        self.assertIs(app_messenger.serializer_for("debug:1"), serializers["json"])
+        self.assertEqual(
+            app_messenger.serializer_for("other"),
+            (app_messenger.packer, app_messenger.unpacker),
+        )
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            app_messenger.set_serializer("ns", "yaml")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.shards`."""
+
+import asyncio
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.state as app_state
+from async_app.app import AsyncApp
+from async_app.shards import partition
+
+
+def answer():
+    return 42
+
+
+def setup():
+    return "done"
+
+
+def tick():
+    pass
+
+
+def task_description(name, **kwargs):
+    return {"name": name, "kind": "continuous", **kwargs}
+
+
+class TestPartition(unittest.TestCase):
+
+    def test_weight(self):
+        task_descriptions = [
+            task_description("heavy", weight=3),
+            task_description("light1"),
+            task_description("light2"),
+            task_description("light3"),
+        ]
+        shards = partition(task_descriptions, 2, "weight")
+
+        self.assertEqual([len(shard) for shard in shards], [1, 3])
+
+    def test_hash_is_stable(self):
+        task_descriptions = [task_description(f"task{i}") for i in range(10)]
+
+        self.assertEqual(
+            partition(task_descriptions, 3, "hash"),
+            partition(task_descriptions, 3, "hash"),
+        )
+
+    def test_dependents_stay_together(self):
+        task_descriptions = [
+            task_description("provider", provides="connection", weight=5),
+            task_description("user", depends_on=["connection"]),
+            task_description("other"),
+        ]
+        shards = partition(task_descriptions, 2, "weight")
+
+        names = [[task["name"] for task in shard] for shard in shards]
+        self.assertIn(["provider", "user"], names)
+
+
+class TestShardedRun(unittest.TestCase):
+
+    def tearDown(self):
+        app_state.reset()
+
+    def test_results_are_gathered(self):
+        app = AsyncApp(workers=2)
+        for _ in range(2):
+            app.add_task_description(
+                {"kind": "continuous", "function": answer, "executor": "loop"}
+            )
+        results = asyncio.run(app.run())
+
+        self.assertEqual(sorted(result["shard"] for result in results), [0, 1])
+        self.assertEqual([result["result"] for result in results], [42, 42])
+
+    def test_callback_sink_gets_the_results_of_all_shards(self):
+        records = []
+        app = AsyncApp(workers=2, result_sink=records.append)
+        for _ in range(2):
+            app.add_task_description(
+                {"kind": "continuous", "function": answer, "executor": "loop"}
+            )
+        asyncio.run(app.run())
+
+        self.assertEqual(sorted(record["shard"] for record in records), [0, 1])
+        self.assertEqual(app.result_summary.as_dict()["done"], 2)
+
+    def test_init_tasks_for_one_shard(self):
+        app = AsyncApp(workers=2)
+        app.add_task_description({"kind": "init", "function": setup, "shard": "one"})
+        for _ in range(2):
+            app.add_task_description(
+                {"kind": "continuous", "function": answer, "executor": "loop"}
+            )
+        results = asyncio.run(app.run())
+
+        names = [result["name"] for result in results]
+        self.assertEqual(names.count("setup"), 1)
+
+    def test_monitor_records_are_gathered(self):
+        # monitors publish their records, no redis needed for that
+        backend_name = app_messenger.backend_name
+        self.addCleanup(app_messenger.set_backend, backend_name)
+        app = AsyncApp(
+            workers=2,
+            periodicals_monitoring_frequency=20,
+            task_monitoring_frequency=20,
+            messenger_backend="local",
+        )
+        for _ in range(2):
+            app.add_task_description(
+                {"kind": "periodic", "function": tick, "frequency": 20}
+            )
+
+        async def main():
+            asyncio.get_running_loop().call_later(0.5, app.exit)
+            await app.run()
+
+        asyncio.run(main())
+
+        self.assertEqual(sorted(app.shard_records), [0, 1])
+        for records in app.shard_records.values():
+            self.assertIn("periodicals_monitor", records)
+            # the task monitor returns None while nothing changes
+            self.assertIsNotNone(records["task_monitor"])
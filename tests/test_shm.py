@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.shm`."""
+
+import asyncio
+import os
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.shm as app_shm
+import async_app.state as app_state
+from async_app.shm import SharedRingBuffer
+
+
+class TestSharedRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = SharedRingBuffer(
+            f"async_app_test_{os.getpid()}", slots=2, slot_size=16, create=True
+        )
+        self.reader = SharedRingBuffer(self.writer.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_read_without_copy(self):
+        descriptor = self.writer.write(b"hello")
+
+        view = self.reader.view(descriptor)
+        self.assertEqual(bytes(view), b"hello")
+        self.assertEqual(view.obj, self.reader.shm.buf.obj)
+        view.release()
+
+    def test_overwritten_slots_are_detected(self):
+        descriptors = [self.writer.write(bytes([i])) for i in range(3)]
+
+        self.assertIsNone(self.reader.view(descriptors[0]))
+        self.assertTrue(self.reader.is_current(descriptors[2]))
+
+    def test_headroom(self):
+        first = self.writer.write(b"a")
+        self.assertEqual(self.reader.headroom(first), 2)
+        self.writer.write(b"b")
+        self.assertEqual(self.reader.headroom(first), 1)
+
+    def test_payloads_larger_than_a_slot(self):
+        with self.assertRaises(ValueError):
+            self.writer.write(bytes(17))
+
+
+class TestChannel(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_shm.close()
+        app_state.reset()
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_publish_and_listen(self):
+        received = []
+
+        listener = asyncio.create_task(
+            app_shm.listener("frames", lambda view: received.append(bytes(view)))
+        )
+        await asyncio.sleep(0)
+        await app_shm.publish("frames", bytearray(b"frame"))
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(received, [b"frame"])
+        app_state.stop()
+        await asyncio.wait_for(listener, 1)
+
+    async def test_payloads_close_to_being_overwritten_are_copied(self):
+        received = []
+        copy_margin = app_shm.copy_margin
+        app_shm.copy_margin = app_shm.slots
+        self.addCleanup(setattr, app_shm, "copy_margin", copy_margin)
+
+        listener = asyncio.create_task(app_shm.listener("frames", received.append))
+        await asyncio.sleep(0)
+        copied = app_shm.statistics["copied"]
+        await app_shm.publish("frames", b"frame")
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(received, [b"frame"])
+        self.assertIsInstance(received[0], bytes)
+        self.assertEqual(app_shm.statistics["copied"], copied + 1)
+        app_state.stop()
+        await asyncio.wait_for(listener, 1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.state`."""
+
+import asyncio
+import unittest
+
+import async_app.state as app_state
+from async_app.app import AsyncApp
+
+
+class TestState(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        app_state.reset()
+
+    async def test_sleep_wakes_up_on_stop(self):
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, app_state.stop)
+
+        tic = loop.time()
+        keep_running = await app_state.sleep(10)
+
+        self.assertFalse(keep_running)
+        self.assertLess(loop.time() - tic, 1)
+
+    async def test_run_until_stopped(self):
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, app_state.stop)
+
+        result = await asyncio.wait_for(
+            app_state.run_until_stopped(asyncio.sleep(10, "done")), 1
+        )
+
+        self.assertIsNone(result)
+
+    async def test_exit_cancels_hanging_tasks(self):
+        async def hanging():
+            await asyncio.sleep(10)
+
+        async def sleeper():
+            while await app_state.sleep(10):
+                pass
+            return "woken up"
+
+        app = AsyncApp(drain_timeout=0.1)
+        app.add_task_description({"kind": "continuous", "function": hanging})
+        app.add_task_description({"kind": "continuous", "function": sleeper})
+        asyncio.get_running_loop().call_later(0.05, app.exit)
+
+        results = await asyncio.wait_for(app.run(), 2)
+
+        results = {result["name"]: result for result in results}
+        self.assertEqual(results["hanging"]["exception"], "cancelled")
+        self.assertEqual(results["sleeper"]["result"], "woken up")
+
+    async def test_scheduler_drains_its_own_calls(self):
+        async def hanging():
+            await asyncio.sleep(10)
+
+        app = AsyncApp(drain_timeout=0.3)
+        app.add_task_description(
+            {
+                "kind": "periodic",
+                "function": hanging,
+                "frequency": 10,
+                "max_concurrency": 1,
+            }
+        )
+        asyncio.get_running_loop().call_later(0.2, app.exit)
+
+        results = await asyncio.wait_for(app.run(), 2)
+
+        results = {result["name"]: result for result in results}
+        statistics = results["periodic_scheduler"]["result"]
+        self.assertEqual(results["periodic_scheduler"]["state"], "done")
+        self.assertEqual(statistics["cancelled"], 0)
+        self.assertEqual(statistics["periodicals"], 1)
+        self.assertGreater(statistics["dropped"], 0)
+        self.assertEqual(app.result_summary.counts["cancelled"], 0)
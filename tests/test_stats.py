@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.stats`."""
+
+import random
+import unittest
+
+from async_app.stats import LogHistogram, TaskStatistics
+
+
+class TestLogHistogram(unittest.TestCase):
+
+    def test_quantiles_are_accurate(self):
+        values = [random.uniform(0.001, 1) for _ in range(10000)]
+        histogram = LogHistogram(accuracy=0.01)
+        for value in values:
+            histogram.add(value)
+
+        values.sort()
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(histogram.quantile(q), exact, delta=0.02 * exact)
+
+    def test_merge(self):
+        first, second, both = LogHistogram(), LogHistogram(), LogHistogram()
+        for value in range(1, 100):
+            (first if value % 2 else second).add(value)
+            both.add(value)
+        first.merge(second)
+
+        self.assertEqual(first.buckets, both.buckets)
+        self.assertEqual(first.quantile(0.99), both.quantile(0.99))
+
+    def test_empty(self):
+        self.assertIsNone(LogHistogram().quantile(0.5))
+
+
+class TestTaskStatistics(unittest.TestCase):
+
+    def test_rate(self):
+        statistics = TaskStatistics()
+        for call in range(100):
+            statistics.observe(call * 0.1, 0.01, failed=call == 0)
+
+        snapshot = statistics.snapshot()
+        self.assertAlmostEqual(snapshot["rate"], 10)
+        self.assertEqual(snapshot["count"], 100)
+        self.assertEqual(snapshot["failed"], 1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.timeseries`."""
+
+import asyncio
+import unittest
+
+import numpy as np
+
+import async_app.messenger as app_messenger
+import async_app.state as app_state
+import async_app.timeseries as app_timeseries
+from async_app.timeseries import RingBuffer, TimeSeriesStore
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = TimeSeriesStore(capacity=100)
+        # 0.5 s apart for 3 minutes
+        for i in range(360):
+            self.store.add_record("monitor", {"cpu": {"percent": i % 60}}, t=i / 2)
+
+    def test_raw_samples_are_bounded(self):
+        result = self.store.query("monitor.cpu.percent")
+
+        self.assertEqual(len(result["times"]), 100)
+        np.testing.assert_array_equal(result["times"], np.arange(260, 360) / 2)
+
+    def test_buffers_grow_on_demand(self):
+        self.store.add_record("sparse", {"value": 1.0, "pid": 42}, exclude=("pid",))
+        series = self.store.series["sparse.value"]
+
+        self.assertEqual(self.store.metrics()[-1], "sparse.value")
+        self.assertEqual(len(series.raw.data), RingBuffer.initial_size)
+        self.assertIsNone(series.rollups["1h"].data)
+        self.assertEqual(len(self.store.series["monitor.cpu.percent"].raw.data), 100)
+
+    def test_rollups(self):
+        result = self.store.query("monitor.cpu.percent", resolution="1min")
+
+        np.testing.assert_array_equal(result["times"], [0, 60, 120])
+        np.testing.assert_array_equal(result["min"], [0, 0, 0])
+        np.testing.assert_array_equal(result["max"], [59, 59, 59])
+        self.assertEqual(
+            self.store.query("monitor.cpu.percent", resolution="1s", aggregate="count"),
+            360,
+        )
+
+    def test_range_and_aggregate(self):
+        value = self.store.query(
+            "monitor.cpu.percent", start=170, end=175, aggregate="mean"
+        )
+
+        self.assertEqual(value, np.mean([i % 60 for i in range(340, 351)]))
+        self.assertIsNone(self.store.query("unknown", aggregate="max"))
+
+    def test_unknown_resolution(self):
+        with self.assertRaises(ValueError):
+            self.store.query("monitor.cpu.percent", resolution="1d")
+
+
+class TestQueries(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_state.reset()
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_query_through_the_messenger(self):
+        app_timeseries.store.add("test.metric", 42.0)
+        server = asyncio.create_task(app_timeseries.serve_queries("test:timeseries"))
+        await asyncio.sleep(0)
+
+        value = await app_timeseries.query(
+            "test:timeseries", metric="test.metric", aggregate="last"
+        )
+        self.assertEqual(value, 42.0)
+        self.assertIn(
+            "test.metric",
+            await app_timeseries.query("test:timeseries", metrics=True),
+        )
+        with self.assertRaises(ValueError):
+            await app_timeseries.query("test:timeseries", metric="x", resolution="1d")
+
+        app_state.stop()
+        await asyncio.wait_for(server, 1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""Tests for `async_app.tools`."""
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import async_app.messenger as app_messenger
+import async_app.tools as app_tools
+
+
+class TestMonitors(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend_name = app_messenger.backend_name
+        app_messenger.set_backend("local")
+
+    def tearDown(self):
+        app_messenger.set_backend(self.backend_name)
+
+    async def test_cpu_monitor_does_not_block(self):
+        children = [
+            subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+            for _ in range(3)
+        ]
+        self.addCleanup(lambda: [child.kill() for child in children])
+
+        tic = time.perf_counter()
+        await app_tools.cpu_monitor()
+        record = await app_tools.cpu_monitor()
+
+        self.assertLess(time.perf_counter() - tic, 0.1)
+        self.assertGreaterEqual(len(record), 1)
+
+    async def test_process_objects_are_kept(self):
+        await app_tools.process_monitor()
+        process = app_tools._processes["process_monitor"][os.getpid()]
+        await app_tools.cpu_monitor()
+        record = await app_tools.process_monitor()
+
+        self.assertIs(app_tools._processes["process_monitor"][os.getpid()], process)
+        # the cpu monitor doesn't reset the baseline of the process monitor
+        self.assertIsNot(app_tools._processes["cpu_monitor"][os.getpid()], process)
+        self.assertEqual(record["pid"], os.getpid())
+        self.assertEqual(await app_messenger.get("async_app:app_monitor"), record)
+
+    async def test_system_monitor(self):
+        record = await app_tools.system_monitor()
+
+        self.assertEqual(sorted(record), ["cpu_percent", "disk_percent", "mem_percent"])